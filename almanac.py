@@ -72,19 +72,15 @@ def degfmt(d, prec=1, html=False):
 	rc += f'%+3dX%04.1f' % (d,m)
 	return rc
 
-if __name__ == "__main__":
+# Declination, its change per hour and the hour angle of the sun at
+# noon UTC for each day of the year, one list of strings per month.
+# Needs the ephem module.
+def make_almanac(year, html=False):
 	import ephem
-	from datetime import datetime
-	html = False
 	degsym = "&deg;" if html else ' '
 
 	sun = ephem.Sun()
 
-	year = datetime.today().year
-
-	if len(sys.argv) > 1:
-		year = int(sys.argv[1])
-
 	cal = []
 	for mon in range(0,12):
 		month = []
@@ -124,8 +120,9 @@ if __name__ == "__main__":
 			month.append(descr)
 			#print("%02d/%02d"
 		cal.append(month)
+	return cal
 
-
+def print_almanac(cal, year, html=False, file=sys.stdout):
 	for ranges in [range(0,6), range(6,12)]:
 		if html:
 			print("""
@@ -136,42 +133,42 @@ table.alternate tr:nth-child(odd) { background-color:#fff; }
 table.alternate td { text-align: end; padding: 0 8px; white-space:pre; }
 </style>
 <table class="alternate" style="break-after: page">
-""")
-			print("<tr>")
+""", file=file)
+			print("<tr>", file=file)
 		for mon in ranges:
 			mname = months[mon][0]
 			if mon == 0 or mon == 6:
 				if html:
-					print(f"<th>{year}</th>")
+					print(f"<th>{year}</th>", file=file)
 				else:
-					print("     ", end='')
+					print("     ", end='', file=file)
 					mname += " %04d" % (year)
 			if html:
-				print(f"<th>{mname}</th>")
+				print(f"<th>{mname}</th>", file=file)
 			else:
-				print("%-23s" % (mname), end='')
+				print("%-23s" % (mname), end='', file=file)
 		if html:
-			print("</tr>")
+			print("</tr>", file=file)
 		else:
-			print()
+			print(file=file)
 
 		for day in range(0,31):
 			if html:
-				print(f"<tr><td>{day+1}</td>")
+				print(f"<tr><td>{day+1}</td>", file=file)
 			else:
-				print("%2d" % (day+1), end='')
+				print("%2d" % (day+1), end='', file=file)
 			for mon in ranges:
 				month = cal[mon]
 				if html:
-					print(f"<td><tt>{month[day] if day < len(month) else ''}</tt></td>")
+					print(f"<td><tt>{month[day] if day < len(month) else ''}</tt></td>", file=file)
 				elif len(month) <= day:
-					print("%-23s" % (' |'), end='')
+					print("%-23s" % (' |'), end='', file=file)
 				else:
-					print(' | ' + month[day], end='')
+					print(' | ' + month[day], end='', file=file)
 			if html:
-				print("</tr>")
+				print("</tr>", file=file)
 			else:
-				print('')
+				print('', file=file)
 
 
 		if html:
@@ -180,6 +177,15 @@ table.alternate td { text-align: end; padding: 0 8px; white-space:pre; }
 #				#              -DDXMM +0.d -mm:ss"
 #				print("<td><tt>   Dec    d    GHA</tt></td>")
 #			print("</tr>")
-			print("</table>")
+			print("</table>", file=file)
 		else:
-			print('')
+			print('', file=file)
+
+if __name__ == "__main__":
+	html = False
+	year = datetime.date.today().year
+
+	if len(sys.argv) > 1:
+		year = int(sys.argv[1])
+
+	print_almanac(make_almanac(year, html), year, html)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# Benchmarks for the rings of the rule and the almanac.
+#
+# Every ring of both faces, and the scales that aren't drawn on either,
+# is built a few times as with --profile and the fastest time of each is
+# kept, along with its elements, path vertices and bytes.  These are
+# compared to a stored baseline and anything that has grown by more than
+# the tolerance is a regression.
+#
+#	./bench.py --update	# store a new baseline for this machine
+#	./bench.py		# compare against it, exits 1 on a regression
+#				# or when there is no baseline yet
+#
+
+import os
+import sys
+import io
+import time
+import json
+import argparse
+import importlib.util
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, here)
+import almanac
+
+def load_rule():
+	spec = importlib.util.spec_from_file_location("make_rule", os.path.join(here, "make-rule.py"))
+	rule = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(rule)
+	return rule
+
+# the fastest time of each ring and the size of the last one built
+def merge(results, stats):
+	name = stats["ring"]
+	r = {
+		"seconds": stats["seconds"],
+		"elements": sum(stats["elements"].values()),
+		"vertices": stats["vertices"],
+		"bytes": stats["bytes"],
+	}
+	if name in results:
+		r["seconds"] = min(r["seconds"], results[name]["seconds"])
+	results[name] = r
+
+# the scales that make_rings() leaves off both faces, so that they are
+# still built and timed until they are drawn
+unused_rings = [
+	("make_sin_sin_scale", (410,)),
+	("make_sqrt_scale", (410, False)),
+	("make_sqrt_scale", (410, True)),
+	("make_log_sine", (360,)),
+	("make_log_tangent", (305,)),
+	("make_gha_scale", (240,)),
+	("make_tangent_scale", (345,)),
+	("make_radians", (340,)),
+	("make_parallax", (375,)),
+]
+
+def bench_rings(rule, repeat, results):
+	# always build the rings instead of reading them from the cache
+	rule.ringcache.cache_dir = None
+	for i in range(repeat):
+		rule.ringcache.memory.clear()
+		rule.profile = []
+		rule.make_rings(True)
+		for (name, args) in unused_rings:
+			rule.ring(getattr(rule, name), *args)
+		for stats in rule.profile:
+			merge(results, stats)
+	rule.profile = None
+
+def bench_almanac(year, repeat, results):
+	try:
+		import ephem
+	except ImportError:
+		print("almanac: skipped, ephem is not installed", file=sys.stderr)
+		return
+	for i in range(repeat):
+		start = time.perf_counter()
+		cal = almanac.make_almanac(year)
+		f = io.StringIO()
+		almanac.print_almanac(cal, year, file=f)
+		text = f.getvalue()
+		merge(results, {
+			"ring": "almanac(%d)" % (year),
+			"seconds": time.perf_counter() - start,
+			"elements": {"day": sum(len(month) for month in cal)},
+			"vertices": 0,
+			"bytes": len(text.encode("utf-8")),
+		})
+
+# the reasons that a result is a regression from its baseline
+def regressions(r, base, time_tolerance, size_tolerance, time_floor):
+	bad = []
+	# the short ones are mostly timer noise
+	if r["seconds"] - base["seconds"] > max(base["seconds"] * time_tolerance, time_floor):
+		bad.append("time")
+	for field in ("elements", "vertices", "bytes"):
+		if r[field] > base[field] * (1 + size_tolerance):
+			bad.append(field)
+	return bad
+
+def main(argv):
+	parser = argparse.ArgumentParser(description="Benchmark the rings of the rule and the almanac")
+	parser.add_argument("--baseline", default=os.path.join(here, "bench-baseline.json"),
+		help="json file with the stored baseline")
+	parser.add_argument("--update", action="store_true",
+		help="store the results as the new baseline instead of comparing")
+	parser.add_argument("-n", "--repeat", type=int, default=5,
+		help="number of times to build each ring, the fastest is used")
+	parser.add_argument("--time-tolerance", type=float, default=0.25,
+		help="fraction that the time can grow by before it is a regression")
+	parser.add_argument("--time-floor", type=float, default=1,
+		help="milliseconds that the time can always grow by")
+	parser.add_argument("--size-tolerance", type=float, default=0.0,
+		help="fraction that the elements, vertices and bytes can grow by")
+	parser.add_argument("--year", type=int, default=2025,
+		help="year of the almanac")
+	opts = parser.parse_args(argv)
+
+	# the images are relative to the repository
+	os.chdir(here)
+
+	results = {}
+	bench_rings(load_rule(), opts.repeat, results)
+	bench_almanac(opts.year, opts.repeat, results)
+
+	if opts.update:
+		with open(opts.baseline, "w") as f:
+			json.dump(results, f, indent=1, sort_keys=True)
+		print("wrote %d results to %s" % (len(results), opts.baseline), file=sys.stderr)
+		return 0
+
+	baseline = None
+	if os.path.exists(opts.baseline):
+		with open(opts.baseline) as f:
+			baseline = json.load(f)
+
+	failed = 0
+	print("%8s %8s %7s %8s %8s %8s  %s" % ("ms", "base ms", "change", "elements", "vertices", "bytes", "ring"))
+	for (name, r) in results.items():
+		base = (baseline or {}).get(name)
+		change = ""
+		bad = []
+		if base is not None:
+			change = "%+6.0f%%" % ((r["seconds"] / base["seconds"] - 1) * 100)
+			bad = regressions(r, base, opts.time_tolerance, opts.size_tolerance, opts.time_floor / 1000)
+		print("%8.1f %8s %7s %8d %8d %8d  %s%s" % (
+			r["seconds"] * 1000,
+			"" if base is None else "%.1f" % (base["seconds"] * 1000),
+			change,
+			r["elements"],
+			r["vertices"],
+			r["bytes"],
+			name,
+			"  REGRESSION: " + ", ".join(bad) if bad else "",
+		))
+		if bad:
+			failed += 1
+
+	if baseline is None:
+		# without one nothing can be a regression, which isn't a pass
+		print("no baseline in %s, run with --update to store one" % (opts.baseline), file=sys.stderr)
+		return 1
+	if failed:
+		print("%d regressions" % (failed), file=sys.stderr)
+		return 1
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv[1:]))
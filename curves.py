@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# Curve fitting for the rings.
+#
+# Most of the curves on the rule are generated in polar coordinates
+# by sampling a function.  Spans where the radius does not change are
+# exact circles and become svg arc commands, everything else is fit
+# with cubic Béziers to within a tolerance (in svg units).
+#
+# The functions can also be sampled adaptively, with more points where
+# the curve bends and fewer where it is nearly straight.
+#
+
+from math import sqrt, sin, cos, radians
+
+def sub(p, q): return (p[0]-q[0], p[1]-q[1])
+def add(p, q): return (p[0]+q[0], p[1]+q[1])
+def scale(p, s): return (p[0]*s, p[1]*s)
+def dot(p, q): return p[0]*q[0] + p[1]*q[1]
+def dist(p, q): return sqrt(dot(sub(p,q), sub(p,q)))
+
+def unit(p):
+	d = sqrt(dot(p,p))
+	if d == 0:
+		return (0,0)
+	return (p[0]/d, p[1]/d)
+
+def polar_xy(r, a):
+	return (r * cos(radians(a)), r * sin(radians(a)))
+
+####
+#### Cubic Bézier fitting, after Schneider's algorithm in Graphics Gems
+####
+
+def bezier(b, t):
+	mt = 1 - t
+	return (
+		b[0][0]*mt*mt*mt + 3*b[1][0]*mt*mt*t + 3*b[2][0]*mt*t*t + b[3][0]*t*t*t,
+		b[0][1]*mt*mt*mt + 3*b[1][1]*mt*mt*t + 3*b[2][1]*mt*t*t + b[3][1]*t*t*t,
+	)
+
+def bezier_d1(b, t):
+	mt = 1 - t
+	return add(add(
+		scale(sub(b[1], b[0]), 3*mt*mt),
+		scale(sub(b[2], b[1]), 6*mt*t)),
+		scale(sub(b[3], b[2]), 3*t*t))
+
+def bezier_d2(b, t):
+	return add(
+		scale(add(sub(b[2], scale(b[1], 2)), b[0]), 6*(1-t)),
+		scale(add(sub(b[3], scale(b[2], 2)), b[1]), 6*t))
+
+def chord_params(pts):
+	u = [0.0]
+	for i in range(1, len(pts)):
+		u.append(u[-1] + dist(pts[i], pts[i-1]))
+	if u[-1] == 0:
+		return [i / (len(pts)-1) for i in range(len(pts))]
+	return [x / u[-1] for x in u]
+
+# least squares for the lengths of the two end tangents
+def generate_bezier(pts, u, t1, t2):
+	first = pts[0]
+	last = pts[-1]
+	c00 = c01 = c11 = x0 = x1 = 0
+	for (p,t) in zip(pts, u):
+		mt = 1 - t
+		a1 = scale(t1, 3*mt*mt*t)
+		a2 = scale(t2, 3*mt*t*t)
+		c00 += dot(a1, a1)
+		c01 += dot(a1, a2)
+		c11 += dot(a2, a2)
+		tmp = sub(p, bezier((first, first, last, last), t))
+		x0 += dot(a1, tmp)
+		x1 += dot(a2, tmp)
+
+	det = c00*c11 - c01*c01
+	seg = dist(first, last)
+	alpha1 = alpha2 = 0
+	if abs(det) > 1e-12:
+		alpha1 = (x0*c11 - x1*c01) / det
+		alpha2 = (c00*x1 - c01*x0) / det
+	if alpha1 < 1e-6 * seg or alpha2 < 1e-6 * seg:
+		# fall back to the heuristic of a third of the chord
+		alpha1 = alpha2 = seg / 3
+	return (first, add(first, scale(t1, alpha1)), add(last, scale(t2, alpha2)), last)
+
+def max_error(pts, b, u):
+	worst = 0
+	split = len(pts) // 2
+	for i in range(1, len(pts)-1):
+		d = dist(bezier(b, u[i]), pts[i])
+		if d > worst:
+			worst = d
+			split = i
+	return (worst, split)
+
+# one step of Newton-Raphson to find better parameters for the points
+def reparameterize(pts, b, u):
+	out = []
+	for (p,t) in zip(pts, u):
+		d = sub(bezier(b, t), p)
+		d1 = bezier_d1(b, t)
+		d2 = bezier_d2(b, t)
+		den = dot(d1, d1) + dot(d, d2)
+		out.append(t if den == 0 else min(1, max(0, t - dot(d, d1) / den)))
+	return out
+
+def fit_cubic(pts, t1, t2, tolerance):
+	if len(pts) == 2:
+		seg = dist(pts[0], pts[1]) / 3
+		return [(pts[0], add(pts[0], scale(t1, seg)), add(pts[1], scale(t2, seg)), pts[1])]
+
+	u = chord_params(pts)
+	b = generate_bezier(pts, u, t1, t2)
+	(err, split) = max_error(pts, b, u)
+	if err < tolerance:
+		return [b]
+	if err < tolerance * 4:
+		for i in range(4):
+			u = reparameterize(pts, b, u)
+			b = generate_bezier(pts, u, t1, t2)
+			(err, split) = max_error(pts, b, u)
+			if err < tolerance:
+				return [b]
+
+	tc = unit(sub(pts[split-1], pts[split+1]))
+	return fit_cubic(pts[:split+1], t1, tc, tolerance) \
+		+ fit_cubic(pts[split:], scale(tc, -1), t2, tolerance)
+
+# Fit a polyline with cubic Béziers, returned as path commands
+def fit_curve(pts, tolerance):
+	if len(pts) < 2:
+		return []
+	t1 = unit(sub(pts[1], pts[0]))
+	t2 = unit(sub(pts[-2], pts[-1]))
+	return [("C", list(b[1]) + list(b[2]) + list(b[3])) for b in fit_cubic(pts, t1, t2, tolerance)]
+
+####
+#### Polar curves
+####
+
+def same_radius(r1, r2):
+	return abs(r1 - r2) <= 1e-9 * max(1, abs(r1))
+
+# arc along a circle from angle a1 to a2, split so that
+# no piece is near 180 degrees where the flags are ambiguous
+def arc_commands(r, a1, a2):
+	cmds = []
+	n = int(abs(a2 - a1) // 120) + 1
+	for i in range(1, n+1):
+		a = a1 + (a2 - a1) * i / n
+		(x,y) = polar_xy(r, a)
+		cmds.append(("A", [abs(r), abs(r), 0, 0, 1 if a2 > a1 else 0, x, y]))
+	return cmds
+
+# Turn a list of (radius, angle) samples into path commands, using arcs
+# where the radius is constant over three or more samples and Bézier
+# curves for the rest.
+def polar_path(samples, tolerance):
+	if len(samples) == 0:
+		return []
+	cmds = [("M", list(polar_xy(*samples[0])))]
+	i = 0
+	n = len(samples)
+	while i < n - 1:
+		# find a run of constant radius in a single direction
+		j = i + 1
+		while j < n and same_radius(samples[j][0], samples[i][0]) \
+		and (samples[j][1] - samples[j-1][1]) * (samples[i+1][1] - samples[i][1]) > 0:
+			j += 1
+		if j - i >= 3:
+			cmds += arc_commands(samples[i][0], samples[i][1], samples[j-1][1])
+			i = j - 1
+			continue
+
+		# otherwise extend until the next run of constant radius
+		j = i + 1
+		while j < n - 1 and not (same_radius(samples[j][0], samples[j+1][0]) and j + 2 < n and same_radius(samples[j][0], samples[j+2][0])):
+			j += 1
+		pts = [polar_xy(*s) for s in samples[i:j+1]]
+		cmds += fit_curve(pts, tolerance)
+		i = j
+	return cmds
+
+####
+#### Adaptive sampling
+####
+
+def segment_dist(p, a, b):
+	ab = sub(b, a)
+	l = dot(ab, ab)
+	if l == 0:
+		return dist(p, a)
+	t = min(1, max(0, dot(sub(p, a), ab) / l))
+	return dist(p, add(a, scale(ab, t)))
+
+# Ramer-Douglas-Peucker, returns the indices of the points to keep
+def simplify(pts, tolerance):
+	keep = [0, len(pts)-1]
+	todo = [(0, len(pts)-1)]
+	while todo:
+		(i, j) = todo.pop()
+		worst = 0
+		split = None
+		for k in range(i+1, j):
+			d = segment_dist(pts[k], pts[i], pts[j])
+			if d > worst:
+				worst = d
+				split = k
+		if split is not None and worst > tolerance:
+			keep.append(split)
+			todo.append((i, split))
+			todo.append((split, j))
+	return sorted(set(keep))
+
+# Sample a parametric curve f(t) -> (x,y) from t0 to t1.  Intervals are
+# split in half until the middle of each one is within half the tolerance
+# of its chord, then the points that aren't needed to stay within the
+# tolerance are removed again.  min_depth makes sure that wiggles smaller
+# than the first intervals aren't missed.  Returns the parameters.
+def adaptive_params(f, t0, t1, tolerance, min_depth=4, max_depth=16):
+	ts = [t0]
+	pts = [f(t0)]
+	todo = [(t1, f(t1), 0)]
+	while todo:
+		(tb, pb, depth) = todo[-1]
+		ta = ts[-1]
+		pa = pts[-1]
+		tm = (ta + tb) / 2
+		pm = f(tm)
+		if depth < max_depth and (depth < min_depth or segment_dist(pm, pa, pb) > tolerance / 2):
+			todo.append((tm, pm, depth+1))
+			# the far half is redone at the deeper level as well
+			todo[-2] = (tb, pb, depth+1)
+			continue
+		ts.append(tb)
+		pts.append(pb)
+		todo.pop()
+
+	return [ts[i] for i in simplify(pts, tolerance / 2)]
@@ -6,46 +6,48 @@ from math import sqrt, sin, cos, tan, atan2, ceil, radians, degrees, asin, acos,
 import drawsvg as draw
 import datetime
 import sys
+import os
 import re
+import argparse
+import multiprocessing
+import time
+import json
+import gzip
+import ringcache
+import svgopt
+import curves
+import scales
+import nomogram
+import svgstream
+import plotter
+import outline
+import raster
+import server
+import sight
+import watch
+import numpy as np
+from importlib import metadata
+
+try:
+	import brotli
+except ImportError:
+	brotli = None # the .br files for --split are skipped
 
 year = 2026 # for equation of time
-pointer_angle = 0
-inner_angle = 0
-outer_angle = 0
-draw_back = True
-output_file = "rule.svg"
-
-if len(sys.argv) > 1 and sys.argv[1].endswith(".png"):
-	# special case for the makefiles where
-	# all the parameters are in the file name
-	output_file = sys.argv[1]
-	group = re.match(r".*-(.*),(.*),(.*)\.png", output_file)
-	if group:
-		pointer_angle = float(group[1])*6
-		inner_angle = float(group[2])*6
-		outer_angle = float(group[3])*6
-		draw_back = 0
-elif len(sys.argv) > 1:
-	pointer_angle = float(sys.argv[1])
-if len(sys.argv) > 2:
-	inner_angle = float(sys.argv[2])
-if len(sys.argv) > 3:
-	outer_angle = float(sys.argv[3])
-if len(sys.argv) > 4:
-	draw_back = int(sys.argv[4])
-
-if len(sys.argv) > 5:
-	output_file = sys.argv[5]
-
-
-d = draw.Drawing(2000 if draw_back else 1000,1000, origin=(0,0))
-d.append_css("""
-.spinner {
-	-webkit-transition: all 2s;
-	-moz-transition: all 2s;
-	transition: all 2s;
-}
-""")
+eye_units = "both" # height of eye scales in "metric", "imperial" or "both"
+
+# Output options, set from the command line
+tick_paths = False # draw each make_ticks() call as one path instead of a line per tick
+optimize_digits = None # fold transforms and round to this many digits, see svgopt.py
+use_symbols = False # store geometry repeated between the rings only once
+curve_tolerance = None # fit sampled curves with arcs and béziers to within this distance
+sample_tolerance = None # sample curves adaptively to within this distance instead of fixed steps
+inline_art = None # inline and minify latitude.svg and longitude.svg with this many digits instead of embedding them as images
+outline_text = False # draw the labels as glyph outlines, see outline.py
+plot_svg = False # write .svg files with only the ordered paths for a plotter, see plotter.py
+plot_tolerance = 96 / 600 / 4 # how closely the plotter follows the curves
+png_dpi = None # render .png outputs in tiles at this resolution, see raster.py
+png_jobs = None # number of processes to render the tiles with
 
 def compute_position(radius, angle, length, log_scale=False, spiral=False):
 	length = 10 # always force same spiral in
@@ -58,8 +60,58 @@ def compute_position(radius, angle, length, log_scale=False, spiral=False):
 def compute_xy(r,a):
 	return (r * cos(radians(a)), r * sin(radians(a)))
 
+# Array versions of compute_position() for all the ticks of a ring at once,
+# returns arrays of the radius and angle of each tick
+def compute_positions(radius, angles, log_scale=False, spiral=False):
+	length = 10 # same as compute_position()
+	a = np.array(list(angles), dtype=float)
+	if log_scale:
+		a = np.log(a) * 360 / log_scale
+	r = np.full(a.shape, float(radius))
+	if spiral:
+		r += (a / 360) * length * 2.1
+	return (r, a)
+
+# cos and sin of each angle.  The standard divisions of the circle are
+# the same on most of the rings, so they are computed once for the whole
+# circle and the angles that fall on one of them are looked up.
+standard_divisions = (60, 120, 360, 600, 720)
+trig_cache = {} # the cos and sin of the divisions by their number
+
+def compute_trig(a):
+	for n in standard_divisions:
+		k = np.rint(a * n / 360)
+		if not np.allclose(a * n / 360, k, rtol=0, atol=1e-6):
+			continue
+		if n not in trig_cache:
+			rad = np.radians(np.arange(n) * 360 / n)
+			trig_cache[n] = (np.cos(rad), np.sin(rad))
+		(c,s) = trig_cache[n]
+		k = k.astype(int) % n
+		return (c[k], s[k])
+	rad = np.radians(a)
+	return (np.cos(rad), np.sin(rad))
+
+# replace fixed samples of a curve with the fewest samples that keep
+# it within sample_tolerance, f(t) returns the (x,y) of the curve
+def resample(f, ts):
+	if sample_tolerance is None or len(ts) < 3:
+		return ts
+	return curves.adaptive_params(f, ts[0], ts[-1], sample_tolerance)
+
+# sampled (radius, angle) points as arcs and bézier curves
+def make_curve(samples, **style):
+	cmds = curves.polar_path(samples, curve_tolerance)
+	return draw.Path(svgopt.fmt_path(cmds, 3), **style)
 
 def draw_spiral(radius, pts, log_scale, stroke='black', stroke_width=0.1, spiral=True):
+	if curve_tolerance is not None:
+		return make_curve(
+			[compute_position(radius,angle,10,log_scale,spiral) for angle in pts],
+			fill='none',
+			stroke=stroke,
+			stroke_width=stroke_width,
+		)
 	arcs = []
 	for angle in pts:
 		(r,a) = compute_position(radius,angle,10,log_scale,spiral)
@@ -72,46 +124,83 @@ def draw_spiral(radius, pts, log_scale, stroke='black', stroke_width=0.1, spiral
 		stroke_width=stroke_width,
 	)
 
+# compact number formatting for path data, "12.5" instead of "12.500"
+def fmt_num(x, digits=3):
+	s = "%.*f" % (digits, x)
+	if "." in s:
+		s = s.rstrip("0").rstrip(".")
+	if s == "-0":
+		s = "0"
+	return s
+
 def make_ticks(radius, ticks, length, log_scale=None, stroke='black', spiral=False, side=3, **style):
 	g = draw.Group()
-	for angle in ticks:
-		(r,a) = compute_position(radius, angle, length, log_scale, spiral)
-		g.append(draw.Line(
-			-length if side & 1 != 0 else 0,
-			0,
-			+length if side & 2 != 0 else 0,
-			0,
-			fill='none',
-			stroke=stroke,
-			transform="rotate(%.3f) translate(%.3f)" % (a,r),
-			**style,
-		))
+	if tick_paths:
+		# all the ticks of this class share a stroke and width, so they
+		# can be drawn as one path with the rotations already applied
+		x0 = -length if side & 1 != 0 else 0
+		x1 = +length if side & 2 != 0 else 0
+		(r,a) = compute_positions(radius, ticks, log_scale, spiral)
+		(c,s) = compute_trig(a)
+		path = []
+		for (xa,ya,xb,yb) in zip((r+x0)*c, (r+x0)*s, (r+x1)*c, (r+x1)*s):
+			path.append("M%s %sL%s %s" % (
+				fmt_num(xa), fmt_num(ya),
+				fmt_num(xb), fmt_num(yb),
+			))
+		if path:
+			g.append(draw.Path("".join(path),
+				fill='none',
+				stroke=stroke,
+				**style,
+			))
+		return g
+
+	(rs,angles) = compute_positions(radius, ticks, log_scale, spiral)
+	if len(rs) == 0:
+		return g
+	g.append(svgstream.Ticks(
+		-length if side & 1 != 0 else 0,
+		+length if side & 2 != 0 else 0,
+		(angles, rs),
+		fill='none',
+		stroke=stroke,
+		transform="rotate(%.3f) translate(%.3f)",
+		**style,
+	))
 	return g
 
 def make_labels(radius, step, start, end, fmter, pos=(1,9), size=10, text_angle=+90, fill="black", **style):
 	g = draw.Group()
+	angles = []
+	texts = []
 	m = start
 	while m < end:
-		s = fmter(m) #"%.0f" % (m)
-		g.append(draw.Text(s, size, pos[0], pos[1],
-			#align="left",
-			fill=fill,
-			stroke='none',
-			transform="rotate(%.3f) translate(%.3f) rotate(%.3f)" % (m,radius,text_angle),
-			**style,
-		))
+		angles.append(m)
+		texts.append(fmter(m)) #"%.0f" % (m)
 		m += step
+	if len(texts) == 0:
+		return g
+	g.append(svgstream.Texts(texts, size, pos[0], pos[1],
+		(angles, radius, text_angle),
+		#align="left",
+		fill=fill,
+		stroke='none',
+		transform="rotate(%.3f) translate(%.3f) rotate(%.3f)",
+		**style,
+	))
 	return g
 
 def make_tick_labels(radius, labels, size=10, log_scale=None, align="right", text_angle=0, pos=(0,0), fill="black", stroke=None, stroke_width=0.3, length=0, side=3, spiral=False, **style):
 	g = draw.Group()
-	for (angle,label) in labels:
-		(r,a) = compute_position(radius, angle, length, log_scale, spiral)
-		g.append(draw.Text(label, size, pos[0], pos[1],
+	(rs,angles) = compute_positions(radius, [x[0] for x in labels], log_scale, spiral)
+	if len(rs) != 0:
+		g.append(svgstream.Texts([x[1] for x in labels], size, pos[0], pos[1],
+			(angles, rs, text_angle),
 			align=align,
 			fill=fill,
 			stroke='none',
-			transform="rotate(%.3f) translate(%.3f) rotate(%.3f)" % (a, r, text_angle),
+			transform="rotate(%.3f) translate(%.3f) rotate(%.3f)",
 			**style,
 		))
 
@@ -134,10 +223,7 @@ def deg2sec(m):
 
 def frange(start, end, step=1):
 	n_items = int(ceil((end - start) / step))
-	items = []
-	for i in range(n_items):
-		items.append(start+i*step)
-	return items
+	return (start + np.arange(n_items) * step).tolist()
 
 def make_rule(radius, major, minor1, minor2, minor3=None, fmt=deg2sec, pos=(1,9), start=0, end=360, size=10, side=3, ticksize=11):
 	g = draw.Group()
@@ -162,66 +248,71 @@ def height_of_eye(H_e):
 
 def make_height_of_eye(radius,angle):
 	g = draw.Group(transform="rotate(%.3f)" % (angle))
-	major = [height_of_eye(H_e) for H_e in frange(0,25.1,1)]
-	minor1 = [height_of_eye(H_e) for H_e in frange(0,25,0.5)]
-	minor2 = [height_of_eye(H_e) for H_e in frange(0,5,0.1)]
-	minor2 += [height_of_eye(H_e) for H_e in frange(5,10,0.25)]
-
-	g.append(make_ticks(radius-10, minor2, 4, stroke_width=0.1))
-	g.append(make_ticks(radius-10, minor1, 8, stroke_width=0.2))
-	g.append(make_ticks(radius-10, major,  15, stroke_width=0.3))
-
-	# Meters
-	labels = [[height_of_eye(h_e), "%.0f" % (h_e)] for h_e in
-		[1, 2, 3, 4, 5, 6, 8, 10, 12, 14, 16, 18, 20, 22, 24]]
-
-	g.append(make_tick_labels(
-		radius-10,
-		labels,
-		pos=(-10,+3),
-		text_anchor="end",
-	))
-	g.append(make_tick_labels(
-		radius-10,
-		[[height_of_eye(26.5), "m"]],
-		pos=(-10,+3),
-		text_anchor="end",
-		#stroke="red",
-		#length=8,
-		#stroke_width=0.4,
-	))
-
-	# Feet
-	ft_radius = radius - 50
-	ft_per_m = 3.281
-	major = [height_of_eye(H_e/ft_per_m) for H_e in frange(0,80.1,5)]
-	minor1 = [height_of_eye(H_e/ft_per_m) for H_e in frange(0,80.1,1)]
-
-	labels = [[height_of_eye(h_e/ft_per_m), "%.0f" % (h_e)] for h_e in
-		[5,10,15,20,25,30,35,40,45,50,60,70,80]]
+	if eye_units != "imperial":
+		major = [height_of_eye(H_e) for H_e in frange(0,25.1,1)]
+		minor1 = [height_of_eye(H_e) for H_e in frange(0,25,0.5)]
+		minor2 = [height_of_eye(H_e) for H_e in frange(0,5,0.1)]
+		minor2 += [height_of_eye(H_e) for H_e in frange(5,10,0.25)]
+
+		g.append(make_ticks(radius-10, minor2, 4, stroke_width=0.1))
+		g.append(make_ticks(radius-10, minor1, 8, stroke_width=0.2))
+		g.append(make_ticks(radius-10, major,  15, stroke_width=0.3))
+
+		# Meters
+		labels = [[height_of_eye(h_e), "%.0f" % (h_e)] for h_e in
+			[1, 2, 3, 4, 5, 6, 8, 10, 12, 14, 16, 18, 20, 22, 24]]
+
+		g.append(make_tick_labels(
+			radius-10,
+			labels,
+			pos=(-10,+3),
+			text_anchor="end",
+		))
+		g.append(make_tick_labels(
+			radius-10,
+			[[height_of_eye(26.5), "m"]],
+			pos=(-10,+3),
+			text_anchor="end",
+			#stroke="red",
+			#length=8,
+			#stroke_width=0.4,
+		))
 
-	g.append(make_ticks(ft_radius, minor1,  8, stroke_width=0.2))
-	g.append(make_ticks(ft_radius, major,  15, stroke_width=0.3))
-	g.append(make_tick_labels(
-		ft_radius,
-		labels,
-		pos=(-10,+3),
-		text_anchor="end",
-	))
-	g.append(make_tick_labels(
-		ft_radius,
-		[[height_of_eye(26.5), "ft"]],
-		pos=(-10,+3),
-		text_anchor="end",
-		#stroke="red",
-		#length=8,
-		#stroke_width=0.4,
-	))
+	if eye_units != "metric":
+		# Feet, inside of the meters when there are both
+		ft_radius = radius - 50 if eye_units == "both" else radius - 10
+		ft_per_m = 3.281
+		major = [height_of_eye(H_e/ft_per_m) for H_e in frange(0,80.1,5)]
+		minor1 = [height_of_eye(H_e/ft_per_m) for H_e in frange(0,80.1,1)]
+
+		labels = [[height_of_eye(h_e/ft_per_m), "%.0f" % (h_e)] for h_e in
+			[5,10,15,20,25,30,35,40,45,50,60,70,80]]
+
+		g.append(make_ticks(ft_radius, minor1,  8, stroke_width=0.2))
+		g.append(make_ticks(ft_radius, major,  15, stroke_width=0.3))
+		g.append(make_tick_labels(
+			ft_radius,
+			labels,
+			pos=(-10,+3),
+			text_anchor="end",
+		))
+		g.append(make_tick_labels(
+			ft_radius,
+			[[height_of_eye(26.5), "ft"]],
+			pos=(-10,+3),
+			text_anchor="end",
+			#stroke="red",
+			#length=8,
+			#stroke_width=0.4,
+		))
 		
 	return g
 
 
 def make_arcs(pts, func, fill="none", stroke="black", stroke_width=1, **style):
+	pts = resample(lambda t: compute_xy(*func(t)), pts)
+	if curve_tolerance is not None:
+		return make_curve([func(t) for t in pts], fill=fill, stroke=stroke, stroke_width=stroke_width, **style)
 	points = []
 	for t in pts:
 		(r,a) = func(t)
@@ -511,42 +602,79 @@ def make_gha_scale(radius):
 	#g.append(make_labels(radius, 4, 0, 360, lambda x: "%.0f" % ((90 - x // 4) % 90), font_style="italic", fill="red", text_anchor="end", pos=(-2,-2)))
 	return g
 
-# tangent goes off to infinity as it approaches 90
-# cotangent uses the red reverse scale since cot(theta) = tan(90-theta)
-def make_tangent_scale(radius):
+# as many decimals as the value needs
+def fmt_tick(x):
+	return "%.*f" % (scales.decimals([x]), x)
+
+# A scale of any function f that maps the values from lo to hi to an
+# angle in degrees, with the ticks picked by scales.py so that they are
+# as fine as they can be while staying spacing apart, and the labels
+# label_spacing apart.  The lengths and widths are for the majors and
+# then each level of minor ticks.  Labels are formatted with fmt, or
+# with as many decimals as each one needs, and reverse_fmt adds a
+# second set of labels in red on the other side of the major ticks.
+def make_scale(radius, f, lo, hi,
+	fmt=None,
+	reverse_fmt=None,
+	spacing=1.0,
+	label_spacing=40,
+	lengths=(10,6,4,2),
+	widths=(0.5,0.4,0.3,0.2),
+	size=8,
+	pos=(2,8),
+	side=3,
+	**style
+):
 	g = draw.Group()
+	(majors, minors) = scales.tick_hierarchy(f, lo, hi, radius, spacing, label_spacing, levels=len(lengths)-1)
+	angle = scales.vectorize(f)
+
+	# shortest ticks first so that the longer ones are drawn on top
+	for level in reversed(range(len(minors))):
+		g.append(make_ticks(radius,
+			angle(minors[level]),
+			length=lengths[level+1],
+			stroke_width=widths[level+1],
+			stroke="black",
+			side=side,
+		))
 
-	major = []
-	minor1 = []
-	minor2 = []
-	for a in frange(0, 2, 0.1):
-		major += [[degrees(atan(a))*4, "%.1f" % (a)]]
-	for a in frange(2, 10, 1) + [10,12,14,20,30,80]:
-		major += [[degrees(atan(a))*4, "%.0f" % (a)]]
-
-	for a in frange(2, 10, 0.5) + frange(10,30,1):
-		minor1 += [degrees(atan(a))*4]
-	for a in frange(0, 2, 0.01) + frange(2,5, 0.1) + frange(5, 10, 0.25) + frange(30,90,5):
-		minor2 += [degrees(atan(a))*4]
-
-	g.append(make_ticks(radius,
-		minor2,
-		length=2,
-		stroke_width=0.2,
-	))
-	g.append(make_ticks(radius,
-		minor1,
-		length=5,
-		stroke_width=0.2,
-	))
+	if fmt is None:
+		fmt = fmt_tick
 	g.append(make_tick_labels(radius,
-		major,
-		10,
+		[[a, fmt(x)] for (x,a) in zip(majors, angle(majors))],
+		size,
 		text_angle=90,
-		pos=(2,8),
+		pos=pos,
 		stroke="black",
-		length=8,
-		stroke_width=0.4,
+		length=lengths[0],
+		stroke_width=widths[0],
+		side=side,
+		**style
+	))
+
+	if reverse_fmt is not None:
+		g.append(make_tick_labels(radius,
+			[[a, reverse_fmt(x)] for (x,a) in zip(majors, angle(majors))],
+			size,
+			text_angle=90,
+			text_anchor="end",
+			fill="red",
+			pos=(-pos[0],pos[1]),
+		))
+
+	return g
+
+# tangent goes off to infinity as it approaches 90
+# cotangent uses the red reverse scale since cot(theta) = tan(90-theta)
+def make_tangent_scale(radius):
+	g = draw.Group()
+	g.append(make_scale(radius,
+		lambda x: np.degrees(np.arctan(x))*4,
+		0, 80,
+		label_spacing=25,
+		lengths=(8,5,2),
+		widths=(0.4,0.2,0.2),
 	))
 	g.append(draw.Circle(
 		0, 0, radius,
@@ -798,35 +926,16 @@ def make_sine_nolog(radius):
 
 	return g
 
-def make_sine(radius,major,minor1,minor2,minor3):
-	g = draw.Group()
-	convert = lambda pts: [sin(radians(pt)) for pt in pts]
-
-	g.append(make_logscale(radius, "", # we will label
-		convert(major),
-		convert(minor1),
-		convert(minor2),
-		convert(minor3),
-		[],
+# log scale of the sine from lo to hi degrees, one turn per decade
+def make_sine(radius, lo, hi):
+	return make_scale(radius,
+		lambda x: np.log10(np.sin(np.radians(x)))*360,
+		lo, hi,
+		# cosine is reverse of sin in red
+		reverse_fmt=lambda x: "%.*f" % (scales.decimals([x]), 90 - x),
+		pos=(2,-2),
 		side=2,
-		fmt=lambda x: ("%.1f" if x < 0.14 else "%.0f") % (degrees(asin(x))),
-		#fmt=lambda x: "%.1f" % (degrees(asin(x))),
-		log_scale=log(10),
-		extra_labels=[],
-	))
-
-	# cosine is reverse of sin in red
-	g.append(make_tick_labels(radius,
-		[[x, ("%.1f" if x < 0.104 else "%.0f") % (90 - degrees(asin(x)))] for x in convert(major)],
-		8,
-		log_scale=log(10),
-		text_angle=90,
-		text_anchor="end",
-		fill="red",
-		pos=(-1,-2),
-	))
-
-	return g
+	)
 
 # Sine is one quadrant for increased accuracy and makes two circles
 # for 0.01 to 0.1 and 0.1 to 1.0
@@ -834,80 +943,32 @@ def make_sine(radius,major,minor1,minor2,minor3):
 def make_log_sine(radius):
 	g = draw.Group()
 
-	# start at -20 since we will spiral outwards for the larger angles
-	#radius -= 20
-	# sine 0.56 - 5.6 degrees
-	s1 = (0.7, 6.0+0.0001)
-	g.append(make_sine(radius-25,
-		frange(s1[0], 3.01, 0.1) + frange(3.0, s1[1], 0.2),
-		frange(0.65, s1[1], 0.05),
-		frange(0.62, s1[1], 0.01),
-		frange(0.62, 1.801, 0.005),
-	))
-
+	# sine 0.57 - 5.7 degrees
+	g.append(make_sine(radius-25, 0.6, 6))
 
-	# sine 5.6 - 90 degrees
-	g.append(make_sine(radius,
-		frange(6, 40.1, 1) + frange(45, 80, 5) + frange(80,90.1,10),
-		frange(6, 80, 0.5) + frange(80,90,1),
-		frange(6, 40, 0.1) + frange(40,75,0.25),
-		frange(6, 20, 0.05)
-	))
+	# sine 5.7 - 90 degrees
+	g.append(make_sine(radius, 6, 90))
 
 	return g
 
-def make_tangent(radius, major, minor1, minor2, minor3):
-	g = draw.Group()
-	convert = lambda pts: [tan(radians(pt)) for pt in pts]
-
-	g.append(make_logscale(radius, "",
-		convert(major),
-		convert(minor1),
-		convert(minor2),
-		convert(minor3),
-		[],
+# log scale of the tangent from lo to hi degrees, one turn per decade
+def make_tangent(radius, lo, hi):
+	return make_scale(radius,
+		lambda x: np.log10(np.tan(np.radians(x)))*360,
+		lo, hi,
+		# cotan is in reverse in red
+		reverse_fmt=lambda x: "%.*f" % (scales.decimals([x]), 90 - x),
+		pos=(2,-2),
 		side=2,
-		fmt=lambda x: ("%.1f" if x < 0.17 else "%.0f") % (degrees(atan(x))),
-		log_scale=log(10),
-		extra_labels=[],
-	))
-
-	# cotan is in reverse in red
-	g.append(make_tick_labels(radius,
-		[[x, ("%.1f" if x < 0.17 else "%.0f") % (90 - degrees(atan(x)))] for x in convert(major)],
-		8,
-		log_scale=log(10),
-		text_angle=90,
-		text_anchor="end",
-		fill="red",
-	))
-
-	return g
+	)
 
 # 0 to 45 and 45 to 90
 def make_log_tangent(radius):
 	g = draw.Group()
 
-	g.append(make_tangent(radius,
-		frange(45, 84.001, 1),
-		frange(45, 84.001, 0.5),
-		frange(45, 84.001, 0.1),
-		frange(45, 84.001, 0.05),
-	))
-
-	g.append(make_tangent(radius-22,
-		frange(6, 45.001, 1),
-		frange(6, 45.001, 0.5),
-		frange(6, 45.001, 0.1),
-		frange(6, 20, 0.05),
-	))
-
-	g.append(make_tangent(radius-44,
-		frange(2, 6.001, 1) + frange(0.7, 3, 0.1),
-		frange(0.7, 3, 0.1) + frange(3, 6.001, 0.5),
-		frange(0.65, 3.001, 0.05) + frange(3, 6.001, 0.05),
-		frange(0.65, 1.001, 0.01),
-	))
+	g.append(make_tangent(radius, 45, 84))
+	g.append(make_tangent(radius-22, 6, 45))
+	g.append(make_tangent(radius-44, 0.6, 6))
 
 	g.append(draw.Circle(0, 0, radius+15,
 		fill="none",
@@ -923,7 +984,6 @@ def make_log_tangent(radius):
 
 	return g
 
-# Sine is one quadrant for increased accuracy
 def old_make_sine(radius):
 	g = draw.Group()
 	labels = []
@@ -998,18 +1058,25 @@ def old_make_sine(radius):
 
 	return g
 
-def make_logscale(radius, label, major, minor1, minor2, minor3, minor4,
+# log scale from lo to hi with one turn for every log_scale, the ticks
+# are picked by make_scale() and the extra labels get short red ticks
+def make_logscale(radius, label, lo, hi,
 	log_scale=log(10),
 	extra_labels=None,
-	fmt=lambda x: "%d" % (x),
+	fmt=None,
 	text_anchor="start",
 	pos=(2,+10),
-	spiral=False,
 	side=3, # left/right/both
 	**kwargs
 ):
 	g = draw.Group()
-	(label_r,label_a) = compute_position(radius, major[0], 9, log_scale, spiral)
+	f = lambda x: np.log(x) * 360 / log_scale
+	# on a full turn the end is in the same place as the start, which
+	# already has a label
+	label_fmt = fmt or fmt_tick
+	if abs(abs(f(hi) - f(lo)) - 360) < 1e-6:
+		fmt = lambda x: "" if x == hi else label_fmt(x)
+	(label_r,label_a) = compute_position(radius, lo, 9, log_scale)
 	g.append(draw.Text(label, 9, +12, +8,
 		font_style="bold",
 		fill="blue",
@@ -1017,70 +1084,20 @@ def make_logscale(radius, label, major, minor1, minor2, minor3, minor4,
 		text_anchor="start",
 		transform="rotate(%.3f) translate(%3.f) rotate(+90)" % (label_a, label_r),
 	))
-	if False: #not spiral:
-		g.append(draw.Circle(
-			0, 0, radius,
-			fill='none',
-			stroke='black',
-			stroke_width=0.1,
-		))
-	else:
-		g.append(draw_spiral(
-			radius,
-			minor2,
-			log_scale=log_scale,
-			spiral=spiral,
-			stroke="black",
-			stroke_width=0.1,
-		))
-	g.append(make_ticks(radius,
-		minor4,
-		log_scale=log_scale,
-		length=2,
-		stroke_width=0.1,
-		stroke="black",
-		spiral=spiral,
-		side=side,
-	))
-	g.append(make_ticks(radius,
-		minor3,
-		log_scale=log_scale,
-		length=4,
+	g.append(draw.Circle(
+		0, 0, radius,
+		fill='none',
+		stroke='black',
 		stroke_width=0.1,
-		stroke="black",
-		spiral=spiral,
-		side=side,
-	))
-	g.append(make_ticks(radius,
-		minor2,
-		log_scale=log_scale,
-		length=6,
-		stroke_width=0.2,
-		stroke="black",
-		spiral=spiral,
-		side=side,
-	))
-	g.append(make_ticks(radius,
-		minor1,
-		log_scale=log_scale,
-		length=8,
-		stroke_width=0.3,
-		stroke="black",
-		spiral=spiral,
-		side=side,
 	))
-	g.append(make_tick_labels(radius,
-		[[_, fmt(_)] for _ in major],
-		10,
+	g.append(make_scale(radius, f, lo, hi,
+		fmt=fmt,
+		lengths=(10,8,6,4,2),
+		widths=(0.5,0.3,0.2,0.1,0.1),
+		size=10,
+		pos=pos,
 		side=side,
-		log_scale=log_scale,
-		length=10,
-		stroke_width=0.5,
-		stroke="black",
-		spiral=spiral,
-		text_angle=90,
 		text_anchor=text_anchor,
-		pos=pos,
 		**kwargs
 	))
 
@@ -1094,7 +1111,6 @@ def make_logscale(radius, label, major, minor1, minor2, minor3, minor4,
 			length=3,
 			stroke="red",
 			stroke_width=0.3,
-			spiral=spiral,
 			text_anchor=text_anchor,
 			pos=(pos[0],pos[1]-2),
 			**kwargs
@@ -1111,12 +1127,6 @@ def make_logscale(radius, label, major, minor1, minor2, minor3, minor4,
 def make_sqrt_scale(radius,draw_inverse):
 	g = draw.Group()
 
-	major = frange(2,10)
-	minor1 = frange(1,10,0.5)
-	minor2 = frange(1,10,0.1)
-	minor3 = frange(1,10,0.05)
-	minor4 = frange(1,6, 0.01) + frange(6,10,0.025)
-
 	extra_points = frange(11,20) + [25,35,45,55,65,75]
 
 	extra_labels = [[_/10, "%.1f" % (_/10)] for _ in extra_points]
@@ -1133,12 +1143,7 @@ def make_sqrt_scale(radius,draw_inverse):
 
 
 	# the X scale goes up to 10
-	g.append(make_logscale(radius, "X",
-		major,
-		minor1,
-		minor2,
-		minor3,
-		minor4,
+	g.append(make_logscale(radius, "X", 1, 10,
 		side=side,
 		pos=(2,+10) if draw_inverse else (2,-2),
 		log_scale=log(10),
@@ -1149,27 +1154,17 @@ def make_sqrt_scale(radius,draw_inverse):
 
 	if draw_inverse:
 		# Draw the scales in reverse to make the 1/X scale
-		g.append(make_logscale(radius-20, "1/X",
-			[10,2] + major[2:],
-			minor1,
-			minor2,
-			minor3,
-			minor4,
+		g.append(make_logscale(radius-20, "1/X", 1, 10,
 			fill="red",
 			log_scale=log(0.1),
-			fmt=lambda x: "%.01f" % (x/10),
+			fmt=lambda x: "%.*f" % (scales.decimals([x]) + 1, x/10),
 			text_anchor="end",  # left side of the line
 			pos=(-2,+10),
 			extra_labels = [[_, "%.02f" % (_/100)] for _ in extra_points],
 		))
 	else:
 		# double the scales to go up to 100 for the X^2 on the outside
-		g.append(make_logscale(radius+25, "X²",
-			major + [10] + [10 * _ for _ in major],
-			minor1 + [10 * _ for _ in minor1],
-			minor2 + [10 * _ for _ in minor2],
-			minor3 + [10 * _ for _ in minor3],
-			minor4 + [10 * _ for _ in minor4],
+		g.append(make_logscale(radius+25, "X²", 1, 100,
 			log_scale=log(100),
 			extra_labels=extra_labels + [[_, "%d" % (_)] for _ in extra_points],
 		))
@@ -1407,11 +1402,16 @@ def make_fifteen_degrees(radius):
 	
 
 # minutes that the sun is ahead of noon
-def equation_of_time(d,y=year):
+# (the year is looked up at call time so that it is part of the ring cache key)
+def equation_of_time(d,y=None):
+	if y is None:
+		y = year
 	D = 6.24004077 + 0.01720197 * (365.25 * (y-2000) + d)
 	return -7.659 * sin(D) + 9.863 * sin(2*D + 3.5932)
 
-def julian(m,d,y=year):
+def julian(m,d,y=None):
+	if y is None:
+		y = year
 	return int(datetime.date(y,m,d).strftime("%j"))
 	
 
@@ -1448,18 +1448,7 @@ def make_equation_of_time(radius):
 	#r = lambda d: radius/2 + 30 * sin(2*pi*d/365 + 0.95)
 	r = lambda d: radius - eq_time_radius(d)
 
-	pts = []
-	c = decl_color(0)
-	for d in range(0, 366):
-		minutes = equation_of_time(d)
-		(x,y) = compute_xy(r(d), minutes*6)
-		pts.append(x)
-		pts.append(y)
-		nc = decl_color(d)
-		if nc != c or d == 365:
-			g.append(draw.Lines(*pts, stroke=c, stroke_width=1, fill="none"))
-			c = nc
-			pts = pts[-2:]
+	g.extend(make_analemma(equation_of_time, r))
 
 
 	d = 0
@@ -1536,6 +1525,29 @@ def decl_color(d):
 	# the d term is negative from 21 Jun to 21 Dec
 	return 'black' if d < 171 or d > 354 else 'red'
 
+# The curve through the year, a line for each run of days of the same color.
+# a_func(d) is in minutes of arc and r_func(d) the radius for the day.
+def make_analemma(a_func, r_func):
+	lines = []
+	f = lambda d: compute_xy(r_func(d), a_func(d)*6)
+
+	# the days where the color changes, each run ends on the first
+	# day of the next color so that the lines join up
+	days = [0]
+	c = decl_color(0)
+	for d in range(0, 366):
+		nc = decl_color(d)
+		if nc != c or d == 365:
+			days.append(d)
+			c = nc
+
+	for (start,end) in zip(days[0:-1], days[1:]):
+		pts = []
+		for d in resample(f, list(range(start, end+1))):
+			pts.extend(f(d))
+		lines.append(draw.Lines(*pts, stroke=decl_color(start), stroke_width=1, fill="none"))
+	return lines
+
 # the zeros are at day 80 and day 266, which is where we want
 # the curves to cross.  This produces a nice analemma of the sun's motion
 def make_declination(radius):
@@ -1549,18 +1561,7 @@ def make_declination(radius):
 
 	arcs = []
 
-	pts = []
-	c = decl_color(0)
-	for d in range(0, 366):
-		minutes = declination(d)
-		(x,y) = compute_xy(r(d), minutes*6)
-		pts.append(x)
-		pts.append(y)
-		nc = decl_color(d)
-		if nc != c or d == 365:
-			g.append(draw.Lines(*pts, stroke=c, stroke_width=1, fill="none"))
-			c = nc
-			pts = pts[-2:]
+	g.extend(make_analemma(declination, r))
 
 
 	d = 0
@@ -1623,21 +1624,21 @@ def make_declination(radius):
 	return g
 
 
-def make_sin_sin_scale(radius):
+def make_sin_sin_scale(radius, tolerance=0.05):
 	g = draw.Group(id="sinsin")
 
 	def func(lat, d, lha):
-		return sin(radians(d))*sin(radians(lat)) + cos(radians(d))*cos(radians(lat))*cos(radians(lha))
+		return np.sin(np.radians(d))*np.sin(np.radians(lat)) + np.cos(np.radians(d))*np.cos(np.radians(lat))*np.cos(np.radians(lha))
 
 	# scale on the outside goes from 0 to 0.4 (sin(23))
 	lha = 0
 
 	max_scale = 1
-	max_lat = 60.1
+	max_lat = 60
 	#output_angle = lambda x: 0 if x == 0 else radians(log(max_scale) * 360 / log(x))
-	output_angle = lambda x: 0 if x == 0 else radians(x * 360 / max_scale)
+	output_angle = lambda x: np.where(x == 0, 0, np.radians(x * 360 / max_scale))
 	#output_angle = lambda x: 0 if x == 0 else radians(x * 180 / max_scale)
-	output_radius = lambda l: radius - 350*abs(sin(radians(l)))
+	output_radius = lambda l: radius - 350*np.abs(np.sin(np.radians(l)))
 	for o in frange(0.001,0.01,0.001):
 		g.append(draw.Text("%.3f" % (o),
 			5, 0, 0,
@@ -1652,62 +1653,40 @@ def make_sin_sin_scale(radius):
 			transform="rotate(%.3f) translate(%.3f)" % (degrees(output_angle(o)), radius),
 		))
 
-	for d in [0.1, 0.25, 0.5] + frange(0,25.1,1):
-		pts = []
-		for l in frange(-max_lat,max_lat,1):
-			# compute the angle that provides correct output
-			# for sin(d)*sin(l)
-			o = func(l, d, lha)
-			a = output_angle(o)
-			r = output_radius(l)
-
-			pts.append(r * cos(a))
-			pts.append(r * sin(a))
-
-		g.append(draw.Lines(*pts,
-			fill="none",
-			stroke="black",
-			stroke_width=0.1 if d % 5 != 0 else 0.5,
-		))
-
-		if d < 1:
-			continue
+	# the chart is latitude by declination, and each point of it is
+	# drawn at the radius of its latitude and the angle of func()
+	lats = frange(-max_lat, max_lat + 0.01, 0.5)
+	decs = frange(0, 25.2, 0.1)
+	def project(l, d):
+		a = output_angle(func(l, d, lha))
+		r = output_radius(l)
+		return (r * np.cos(a), r * np.sin(a))
+
+	def draw_contours(z, levels, style):
+		for (level, lines) in nomogram.contours(z, lats, decs, levels, project, tolerance):
+			for xy in lines:
+				g.append(draw.Lines(*xy.ravel(), fill="none", **style(level)))
+
+	dec = nomogram.grid(lambda l, d: d, lats, decs)
+	draw_contours(dec, [0.1, 0.25, 0.5] + frange(0,25.1,1), lambda d: dict(
+		stroke="black",
+		stroke_width=0.1 if d % 5 != 0 else 0.5,
+	))
+	for d in frange(1,25.1,1):
 		g.append(draw.Text("%.0f" % (d), 5, 0, 0,
 			text_anchor="middle",
 			transform="rotate(%.3f) translate(%.3f) rotate(-90)" % (degrees(output_angle(sin(radians(d)))), output_radius(90)),
 		))
 
-
-	for l in frange(-max_lat,max_lat,5):
-		pts = []
-		for d in frange(0.01,25.01,0.01):
-			o = func(l, d, lha)
-			a = output_angle(o)
-			r = output_radius(l)
-
-			pts.append(r * cos(a))
-			pts.append(r * sin(a))
-		g.append(draw.Lines(*pts,
-			fill="none",
-			stroke="black" if l > 0 else "red",
-			stroke_width=0.1,
-		))
-	for l in frange(-max_lat,max_lat,10):
-		pts = []
-		for d in frange(0.01,25.01,0.01):
-			o = func(l, d, lha)
-			a = output_angle(o)
-			r = output_radius(l)
-
-			pts.append(r * cos(a))
-			pts.append(r * sin(a))
-		g.append(draw.Lines(*pts,
-			fill="none",
-			stroke="black" if l > 0 else "red",
-			stroke_width=0.2,
-		))
-			#g.append(draw.Text("%.2f" % v, 7, radius, 0,
-				#transform="rotate(%.3f) translate(%.3f)" % ())
+	lat = nomogram.grid(lambda l, d: l, lats, decs)
+	draw_contours(lat, frange(-max_lat,max_lat+0.01,5), lambda l: dict(
+		stroke="black" if l > 0 else "red",
+		stroke_width=0.1,
+	))
+	draw_contours(lat, frange(-max_lat,max_lat+0.01,10), lambda l: dict(
+		stroke="black" if l > 0 else "red",
+		stroke_width=0.2,
+	))
 
 	return g
 
@@ -1737,151 +1716,865 @@ def make_360_clock(radius):
 
 	return g
 
-####
-#### Front side
-####
-# Outer rules for 0-360 degrees with negative markers
-front = draw.Group(transform="translate(500 500)")
-
 cut = 410
 outer_cut = 500
 
-
-outer = draw.Group(transform="rotate(%.3f)" % (-outer_angle), id="outer", class_="spinner")
-inner = draw.Group(transform="rotate(%.3f)" % (-inner_angle), id="inner", class_="spinner")
-
-outer.append(make_minutes(cut, side=2, divisions2=None))
-inner.append(make_minutes(cut, side=1, divisions2=None))
-
-outer.append(make_ninety_minus(cut + 48))
-outer.append(make_fractional_minutes(cut + 88))
-
-#inner.append(make_rule(400, 360/60, 360/120, 360/600))
-# add an reverse scale for the inner ring
-#inner.append(make_labels(400, 6, 0, 360, lambda x: "-%.0f" % ((60-x/6) % 60), pos=(-2,-2), text_anchor="end", fill="red", font_style="italic"))
-
-h_e_radius = cut - 35
-inner.append(make_height_of_eye(h_e_radius, -180))
-
-# The refraction, parallax and semi diameter can all be done with
-# the one Altitude Correction Table (ACT)
-inner.append(make_refraction(h_e_radius, -180))
-inner.append(make_semidiameter(h_e_radius))
-inner.append(make_d_lines(h_e_radius+10))
-
-inner.append(make_declination(cut-295))
-
-# Cut lines
-axle = draw.Circle(0,0, 5, fill="none", stroke="black", stroke_width=1)
-inner.append(axle)
-outer.append(axle)
-inner.append(draw.Circle(0,0, cut, fill="none", stroke="black", stroke_width=1))
-outer.append(draw.Circle(0,0, outer_cut, fill="none", stroke="black", stroke_width=1))
-
-pointer = draw.Group(transform="rotate(%.3f)" % (pointer_angle), id="pointer", class_="spinner")
-pointer.append(draw.Line(0,0, 500, 0, fill="none", stroke="blue", stroke_width=2))
-pointer.append(draw.Line(0,0, -500, 0, fill="none", stroke="none", stroke_width=2))
-front.append(pointer)
-front.append(outer)
-front.append(inner)
-
-img_sz = cut*2
-inner.append(draw.Image(-img_sz/2, -img_sz/2, img_sz, img_sz, path="latitude.svg", embed=True))
-
-
-
-####
-#### Reverse side
-#### uses a smaller inner disc
-####
-cut = 410
-img_sz = cut * 2
-back = draw.Group(transform="translate(1500 500) rotate(%.3f)" % (+outer_angle))
-back.append(pointer)
-
-outer = draw.Group(id="back_outer")
-inner = draw.Group(id="back_inner")
-inner.append(draw.Image(-img_sz/2, -img_sz/2, img_sz, img_sz, path="longitude.svg", embed=True))
-
-inner.append(axle)
-outer.append(axle)
-inner.append(draw.Circle(0,0, cut, fill="none", stroke="black", stroke_width=1))
-outer.append(draw.Circle(0,0, outer_cut, fill="none", stroke="black", stroke_width=1))
-
-# Make the minutes seconds rings with divisions every 5 seconds
-inner.append(make_minutes(cut, side=1, divisions=60*6, divisions2=60*6*2))
-
-outer.append(make_minutes(cut, side=2, red_offset=90, divisions=60*6, divisions2=60*6*2))
-#outer.append(make_fractional_minutes(468))
-#outer.append(make_ninety_minus(450, False))
-outer.append(make_sine_nolog(cut+45))
-outer.append(make_haversine(cut+75))
-
-# rule for 360 degree circle with reverse angles as well
-inner.append(make_fifteen_degrees(cut-35))
-inner.append(make_360_clock(cut-60))
-inner.append(make_equation_of_time(cut-180))
-
-# 90 degree circle and sine/cosine tables
-#back.append(make_rule(365, 4, 1, 0.5, fmt=lambda x: "%.0f" % (x // 4)))
-#back.append(make_labels(365, 4, 0, 360, lambda x: "%.0f" % ((90 - x // 4) % 90), font_style="italic", fill="red", text_anchor="end", pos=(-2,-2)))
-#back.append(make_sine(345))
-
-#back.append(make_gha_scale(240))
-
-# TODO: make the outer one half sided
-#outer.append(make_sqrt_scale(410, False))
-#inner.append(make_sqrt_scale(410, True))
-#inner.append(make_log_sine(360))
-#inner.append(make_log_tangent(305))
-#inner.append(make_sin_sin_scale(410))
-
-
-#back.append(make_log_cosine(320))
-#back.append(make_sin_sin_scale(200))
-
-back.append(outer)
-back.append(inner)
+# Serialize a list of elements into an SVG fragment that can be
+# re-used as a draw.Raw() element in any number of drawings.
+# The id prefix keeps the ids of different fragments from colliding.
+def make_fragment(elements, id_prefix="d"):
+	d = draw.Drawing(0, 0, id_prefix=id_prefix)
+	d.extend(elements)
+	svg = d.as_svg(header="")
+	svg = svg[svg.index("<defs>\n"):svg.rindex("</svg>")]
+	return svg.replace("<defs>\n</defs>\n", "").rstrip("\n")
+
+# Build one ring and serialize it, unless an identical ring was
+# already built by this or a previous run (see ringcache.py).
+# The id prefix comes from the key so the fragment is byte-identical
+# for identical inputs.
+# The svgstream elements write their own svg, so they are part of the
+# version of the svg library as far as the cache is concerned.
+drawsvg_version = metadata.version("drawsvg") + ringcache.source(svgstream)
+
+# globals that ring() uses to keep track of the build and the caches
+# that fill up as it goes, which don't change what the rings look like
+# so they are not part of the key
+runtime_state = ("pending_rings", "profile", "trig_cache")
+
+def ring(func, *args, **kwargs):
+	salt = drawsvg_version + (outline.font.hash if outline_text else "")
+	key = ringcache.source_key(func, args, kwargs, deps=(ring, build_ring), salt=salt, ignore=runtime_state)
+	# profiling always builds the rings so that the times are real
+	fragment = ringcache.lookup(key) if profile is None else None
+	if fragment is None and pending_rings is not None:
+		# the content is filled in by build_rings()
+		placeholder = draw.Raw("")
+		pending_rings.append((key, func, args, kwargs, placeholder))
+		return placeholder
+	if fragment is None:
+		fragment = build_ring((key, func, args, kwargs))
+		# a profiled build leaves the cache as it was
+		if profile is None:
+			ringcache.store(key, fragment)
+	return draw.Raw(fragment)
+
+def build_ring(job):
+	(key, func, args, kwargs) = job
+	start = time.perf_counter()
+	elem = func(*args, **kwargs)
+	fragment = make_fragment([elem], "r" + key[0:8] + "_")
+	if optimize_digits is not None:
+		fragment = svgopt.optimize_fragment(fragment, optimize_digits)
+	if outline_text:
+		fragment = outline.outline_fragment(fragment)
+	if profile is not None:
+		name = ", ".join([repr(x) for x in args] + ["%s=%r" % x for x in kwargs.items()])
+		profile.append(ring_stats("%s(%s)" % (func.__name__, name), [elem], fragment, time.perf_counter() - start))
+	return fragment
+
+# With --profile the wall time, elements by type, path vertices and
+# serialized size of each ring are recorded here
+profile = None
+
+def count_elements(elements, counts):
+	for elem in elements:
+		if isinstance(elem, draw.Raw):
+			# already serialized rings are counted on their own
+			continue
+		if isinstance(elem, svgstream.Elements):
+			# these stand in for one drawsvg element per row
+			name = "Line" if isinstance(elem, svgstream.Ticks) else "Text"
+			counts[name] = counts.get(name, 0) + len(elem)
+			continue
+		name = type(elem).__name__
+		counts[name] = counts.get(name, 0) + 1
+		count_elements(getattr(elem, "children", []), counts)
+	return counts
+
+def ring_stats(name, elements, fragment, seconds):
+	vertices = 0
+	for d in re.findall(r' d="([^"]*)"', fragment):
+		vertices += len([c for c in svgopt.parse_path(d) if c[0] != "Z"])
+	return {
+		"ring": name,
+		"seconds": seconds,
+		"elements": count_elements(elements, {}),
+		"vertices": vertices,
+		"bytes": len(fragment.encode("utf-8")),
+	}
+
+def print_profile(stats, output=sys.stderr):
+	types = sorted(set(t for r in stats for t in r["elements"]))
+	print("%8s %8s %8s  %s  %s" % ("ms", "vertices", "bytes", " ".join("%6s" % t[0:6] for t in types), "ring"), file=output)
+	for r in stats + [{
+		"ring": "total",
+		"seconds": sum(r["seconds"] for r in stats),
+		"elements": {t: sum(r["elements"].get(t, 0) for r in stats) for t in types},
+		"vertices": sum(r["vertices"] for r in stats),
+		"bytes": sum(r["bytes"] for r in stats),
+	}]:
+		print("%8.1f %8d %8d  %s  %s" % (
+			r["seconds"] * 1000,
+			r["vertices"],
+			r["bytes"],
+			" ".join("%6d" % r["elements"].get(t, 0) for t in types),
+			r["ring"],
+		), file=output)
+
+# With --parallel the rings that aren't in the cache are collected
+# while the faces are laid out and then built by a pool of worker
+# processes.  The fragments come back in the order of the jobs, so
+# the output is the same as a serial build.
+ring_jobs = None # number of processes to build the rings with, None for serial
+pending_rings = None
+
+def build_rings(pending):
+	jobs = {}
+	for (key, func, args, kwargs, placeholder) in pending:
+		jobs.setdefault(key, (key, func, args, kwargs))
+	if len(jobs) == 0:
+		return
+
+	with worker_pool(min(ring_jobs, len(jobs))) as pool:
+		fragments = dict(zip(jobs, pool.map(build_ring, list(jobs.values()), chunksize=1)))
+
+	if profile is None:
+		for (key, fragment) in fragments.items():
+			ringcache.store(key, fragment)
+	for (key, func, args, kwargs, placeholder) in pending:
+		placeholder.content = fragments[key]
+
+# The artwork drawn in Inkscape, either as a base64 <image> or as svg
+# without the editor metadata that is only prepared once per change
+def artwork(fname, x, y, width, height):
+	if inline_art is None:
+		return draw.Image(x, y, width, height, path=fname, embed=True)
+	with open(fname, encoding="utf-8") as f:
+		svg = f.read()
+	prefix = os.path.splitext(os.path.basename(fname))[0] + "_"
+	args = (svg, x, y, width, height, prefix, inline_art)
+	key = ringcache.source_key(svgopt.inline_svg, args)
+	fragment = ringcache.lookup(key)
+	if fragment is None:
+		fragment = svgopt.inline_svg(*args)
+		ringcache.store(key, fragment)
+	return draw.Raw(fragment)
+
+# Geometry that is repeated between the rings, like the minute
+# ticks on both faces, goes into a shared <defs> entry
+def share_rings(rings):
+	if not use_symbols:
+		return rings
+	(defs, rings) = svgopt.share_symbols(rings)
+	rings["defs"] = defs
+	return rings
+
+# The rotating rings are built and serialized once without any rotation
+# so that they can be re-used for every frame of an animation; only the
+# wrapping groups in make_drawing() depend on the angles.
+def make_rings(draw_back=True):
+	global pending_rings
+	if ring_jobs is not None:
+		pending_rings = []
+	faces = {}
+
+	####
+	#### Front side
+	####
+	# Outer rules for 0-360 degrees with negative markers
+	outer = []
+	inner = []
+
+	outer.append(ring(make_minutes, cut, side=2, divisions2=None))
+	inner.append(ring(make_minutes, cut, side=1, divisions2=None))
+
+	outer.append(ring(make_ninety_minus, cut + 48))
+	outer.append(ring(make_fractional_minutes, cut + 88))
+
+	#inner.append(make_rule(400, 360/60, 360/120, 360/600))
+	# add an reverse scale for the inner ring
+	#inner.append(make_labels(400, 6, 0, 360, lambda x: "-%.0f" % ((60-x/6) % 60), pos=(-2,-2), text_anchor="end", fill="red", font_style="italic"))
+
+	h_e_radius = cut - 35
+	inner.append(ring(make_height_of_eye, h_e_radius, -180))
+
+	# The refraction, parallax and semi diameter can all be done with
+	# the one Altitude Correction Table (ACT)
+	inner.append(ring(make_refraction, h_e_radius, -180))
+	inner.append(ring(make_semidiameter, h_e_radius))
+	inner.append(ring(make_d_lines, h_e_radius+10))
+
+	inner.append(ring(make_declination, cut-295))
+
+	# Cut lines
+	axle = draw.Circle(0,0, 5, fill="none", stroke="black", stroke_width=1, class_="cut")
+	inner.append(axle)
+	outer.append(axle)
+	inner.append(draw.Circle(0,0, cut, fill="none", stroke="black", stroke_width=1, class_="cut"))
+	outer.append(draw.Circle(0,0, outer_cut, fill="none", stroke="black", stroke_width=1, class_="cut"))
+
+	pointer = []
+	pointer.append(draw.Line(0,0, 500, 0, fill="none", stroke="blue", stroke_width=2))
+	pointer.append(draw.Line(0,0, -500, 0, fill="none", stroke="none", stroke_width=2))
+
+	img_sz = cut*2
+	inner.append(artwork("latitude.svg", -img_sz/2, -img_sz/2, img_sz, img_sz))
+
+	faces["pointer"] = pointer
+	faces["outer"] = outer
+	faces["inner"] = inner
+
+	if not draw_back:
+		return finish_rings(faces)
+
+	####
+	#### Reverse side
+	#### uses a smaller inner disc
+	####
+	img_sz = cut * 2
+
+	outer = []
+	inner = []
+	inner.append(artwork("longitude.svg", -img_sz/2, -img_sz/2, img_sz, img_sz))
+
+	inner.append(axle)
+	outer.append(axle)
+	inner.append(draw.Circle(0,0, cut, fill="none", stroke="black", stroke_width=1, class_="cut"))
+	outer.append(draw.Circle(0,0, outer_cut, fill="none", stroke="black", stroke_width=1, class_="cut"))
+
+	# Make the minutes seconds rings with divisions every 5 seconds
+	inner.append(ring(make_minutes, cut, side=1, divisions=60*6, divisions2=60*6*2))
+
+	outer.append(ring(make_minutes, cut, side=2, red_offset=90, divisions=60*6, divisions2=60*6*2))
+	#outer.append(make_fractional_minutes(468))
+	#outer.append(make_ninety_minus(450, False))
+	outer.append(ring(make_sine_nolog, cut+45))
+	outer.append(ring(make_haversine, cut+75))
+
+	# rule for 360 degree circle with reverse angles as well
+	inner.append(ring(make_fifteen_degrees, cut-35))
+	inner.append(ring(make_360_clock, cut-60))
+	inner.append(ring(make_equation_of_time, cut-180))
+
+	# 90 degree circle and sine/cosine tables
+	#back.append(make_rule(365, 4, 1, 0.5, fmt=lambda x: "%.0f" % (x // 4)))
+	#back.append(make_labels(365, 4, 0, 360, lambda x: "%.0f" % ((90 - x // 4) % 90), font_style="italic", fill="red", text_anchor="end", pos=(-2,-2)))
+	#back.append(make_sine(345))
+
+	#back.append(make_gha_scale(240))
+
+	# TODO: make the outer one half sided
+	#outer.append(make_sqrt_scale(410, False))
+	#inner.append(make_sqrt_scale(410, True))
+	#inner.append(make_log_sine(360))
+	#inner.append(make_log_tangent(305))
+
+	# the sin-sin nomogram goes around the whole circle from radius 410
+	# down to 107, over the clock, the equation of time and the longitude
+	# artwork, so it stays off until the back has room for it (bench.py
+	# still builds it)
+	#inner.append(make_sin_sin_scale(410))
+
+
+	#back.append(make_log_cosine(320))
+	#back.append(make_sin_sin_scale(200))
+
+	faces["back_outer"] = outer
+	faces["back_inner"] = inner
+
+	return finish_rings(faces)
+
+# serialize the elements of each face once all of their rings are built
+def finish_rings(faces):
+	global pending_rings
+	if pending_rings is not None:
+		build_rings(pending_rings)
+		pending_rings = None
+
+	rings = {}
+	for (name, elements) in faces.items():
+		start = time.perf_counter()
+		rings[name] = make_fragment(elements, name + "_")
+		if profile is not None:
+			# only the elements outside of the rings, like the cut lines and images
+			own = [elem for elem in elements if not isinstance(elem, draw.Raw)]
+			profile.append(ring_stats(name, own, make_fragment(own, name + "_"), time.perf_counter() - start))
+	rings = share_rings(rings)
+
+	if outline_text:
+		# one definition of each glyph that is used anywhere
+		glyphs = outline.glyph_defs(rings.values())
+		rings["defs"] = "\n".join(x for x in (rings.get("defs"), glyphs) if x)
+	return rings
 
 # paper pointer until a better one can be made
+def make_paper_pointer(axle):
+	pointer_diam = 35
+	pointer = draw.Group(class_="spinner")
+	pointer.append(axle)
+	pointer.append(draw.Circle(0,0,pointer_diam, fill="none", stroke="black", stroke_width=2))
+	pointer.append(draw.Lines(
+		+pointer_diam,0,
+		+outer_cut,0,
+		+outer_cut+20,pointer_diam/2,
+		+outer_cut,pointer_diam,
+		0,pointer_diam,
+		fill="white", stroke="black", stroke_width=2, closed=True,
+	))
+	pointer.append(draw.Line(
+		+pointer_diam,5,
+		+outer_cut,5,
+		stroke="red",
+		stroke_width=10,
+	))
+
+	#mirror_pointer = draw.Group(transform="scale(1,-1)")
+	#mirror_pointer.append(pointer)
+
+	#front.append(pointer)
+	#back.append(mirror_pointer)
+
+	# Use a pointer image
+	#d.append(draw.Image(0, 0, 1000+20+pointer_diam*2, 75, path="pointer.svg", embed=False, name="paper-pointer"))
+	return pointer
+
+# Wrap the pre-built rings in their rotations and lay out the two faces
+def make_drawing(rings, pointer_angle=0, inner_angle=0, outer_angle=0, draw_back=True):
+	d = draw.Drawing(2000 if draw_back else 1000,1000, origin=(0,0))
+	d.append_css("""
+.spinner {
+	-webkit-transition: all 2s;
+	-moz-transition: all 2s;
+	transition: all 2s;
+}
+""")
 
-pointer_diam = 35
-pointer = draw.Group(class_="spinner")
-pointer.append(axle)
-pointer.append(draw.Circle(0,0,pointer_diam, fill="none", stroke="black", stroke_width=2))
-pointer.append(draw.Lines(
-	+pointer_diam,0,
-	+outer_cut,0,
-	+outer_cut+20,pointer_diam/2,
-	+outer_cut,pointer_diam,
-	0,pointer_diam,
-	fill="white", stroke="black", stroke_width=2, closed=True,
-))
-pointer.append(draw.Line(
-	+pointer_diam,5,
-	+outer_cut,5,
-	stroke="red",
-	stroke_width=10,
-))
-
-#mirror_pointer = draw.Group(transform="scale(1,-1)")
-#mirror_pointer.append(pointer)
-
-#front.append(pointer)
-#back.append(mirror_pointer)
-
-# Use a pointer image
-#d.append(draw.Image(0, 0, 1000+20+pointer_diam*2, 75, path="pointer.svg", embed=False, name="paper-pointer"))
-
-d.append(front)
-d.append(back)
-
-
+	if rings.get("defs"):
+		d.append_def(draw.Raw(rings["defs"]))
+
+	front = draw.Group(transform="translate(500 500)")
+	pointer = draw.Group(transform="rotate(%.3f)" % (pointer_angle), id="pointer", class_="spinner")
+	outer = draw.Group(transform="rotate(%.3f)" % (-outer_angle), id="outer", class_="spinner")
+	inner = draw.Group(transform="rotate(%.3f)" % (-inner_angle), id="inner", class_="spinner")
+	pointer.append(draw.Raw(rings["pointer"]))
+	outer.append(draw.Raw(rings["outer"]))
+	inner.append(draw.Raw(rings["inner"]))
+	front.append(pointer)
+	front.append(outer)
+	front.append(inner)
+	d.append(front)
+
+	if not draw_back:
+		return d
+
+	back = draw.Group(transform="translate(1500 500) rotate(%.3f)" % (+outer_angle), id="back")
+	back.append(pointer)
+	outer = draw.Group(id="back_outer")
+	inner = draw.Group(id="back_inner")
+	outer.append(draw.Raw(rings["back_outer"]))
+	inner.append(draw.Raw(rings["back_inner"]))
+	back.append(outer)
+	back.append(inner)
+	d.append(back)
+
+	return d
+
+# The rings that the web viewer shows on each face, from the bottom up.
+# Only the ones on the front and the pointer on the back rotate.
+viewer_faces = {
+	"front": ["pointer", "outer", "inner"],
+	"back": ["pointer", "back_outer", "back_inner"],
+}
 
+def viewer_rings(rings):
+	return {face: names for (face, names) in viewer_faces.items() if all(name in rings for name in names)}
+
+# A drawing of one of the rings by itself, centered on the axle,
+# with only the defs that it uses
+def make_ring_drawing(rings, name):
+	d = draw.Drawing(1000, 1000, origin=(0,0))
+	defs = svgopt.used_defs(rings["defs"], rings[name]) if rings.get("defs") else ""
+	if defs:
+		d.append_def(draw.Raw(defs))
+	g = draw.Group(transform="translate(500 500)")
+	g.append(draw.Raw(rings[name]))
+	d.append(g)
+	return d
+
+def save_tiles(rings, directory, levels, jobs=None):
+	faces = viewer_rings(rings)
+	svgs = {name: make_ring_drawing(rings, name).as_svg() for names in faces.values() for name in names}
+	raster.save_pyramid(svgs, faces, directory, levels, jobs, mp_context=pool_context())
+
+# write data to fname and the .gz and .br files next to it for a web
+# server to send instead, returns the size of each
+def save_compressed(fname, data):
+	sizes = {"bytes": len(data)}
+	compressed = {"gz": gzip.compress(data, 9, mtime=0)}
+	if brotli is not None:
+		compressed["br"] = brotli.compress(data, quality=11)
+	with open(fname, "wb") as f:
+		f.write(data)
+	for (ext, z) in compressed.items():
+		with open(fname + "." + ext, "wb") as f:
+			f.write(z)
+		sizes[ext] = len(z)
+	return sizes
+
+# Each ring as its own svg in directory, with rings.json for the viewer
+def save_split(rings, directory):
+	os.makedirs(directory, exist_ok=True)
+	faces = viewer_rings(rings)
+	manifest = {"width": 1000, "height": 1000, "faces": faces, "rings": {}}
+	for names in faces.values():
+		for name in names:
+			fname = name + ".svg"
+			svg = make_ring_drawing(rings, name).as_svg().encode("utf-8")
+			manifest["rings"][name] = dict(file=fname, **save_compressed(os.path.join(directory, fname), svg))
+	with open(os.path.join(directory, "rings.json"), "w") as f:
+		json.dump(manifest, f, indent=1)
+
+def save_drawing(d, output_file):
+	ext = os.path.splitext(output_file)[1].lower()
+	if ext == ".png" and png_dpi is not None:
+		raster.save_png(d.as_svg(), output_file, png_dpi, png_jobs, mp_context=pool_context())
+	elif ext == ".png":
+		d.save_png(output_file)
+	elif ext in plotter.formats and (ext != ".svg" or plot_svg):
+		plotter.save(d.as_svg(), output_file, plot_tolerance)
+	else:
+		d.save_svg(output_file)
+
+# Set the constants of the rings, like {"year": 2027}, from source
+def set_params(params, source):
+	g = globals()
+	for (name, value) in params.items():
+		if name not in g or not ringcache.is_constant(g[name]):
+			raise ValueError("%s: %s is not a constant of make-rule.py" % (source, name))
+		g[name] = value
+
+def load_params(fname):
+	with open(fname) as f:
+		set_params(json.load(f), fname)
+
+# A matrix build is a json file with the years, the variants that each
+# set some of the constants (and "draw_back") and the output files:
+#
+#	{
+#		"years": [2026, 2027],
+#		"variants": {"metric": {"eye_units": "metric"}, "feet": {"eye_units": "imperial"}},
+#		"output": "build/rule-{year}-{variant}.svg"
+#	}
+#
+# Every rule is built with all of the constants that any variant sets,
+# so the workers can build them in any order.
+def matrix_jobs(fname):
+	with open(fname) as f:
+		matrix = json.load(f)
+	variants = matrix.get("variants") or {"rule": {}}
+	defaults = {"year": year}
+	for params in variants.values():
+		for name in params:
+			if name != "draw_back":
+				defaults[name] = globals().get(name)
+
+	work = []
+	for y in matrix.get("years", [year]):
+		for (variant, params) in variants.items():
+			params = dict(defaults, year=y, **params)
+			draw_back = params.pop("draw_back", True)
+			set_params(params, fname)
+			output_file = matrix.get("output", "rule-{year}-{variant}.svg").format(year=y, variant=variant)
+			work.append((output_file, params, draw_back))
+	set_params(defaults, fname)
+	return work
+
+def build_variant(job):
+	(output_file, params, draw_back) = job
+	set_params(params, output_file)
+	before = set(ringcache.memory)
+	rings = make_rings(draw_back)
+	os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+	save_drawing(make_drawing(rings, 0.0, 0.0, 0.0, draw_back), output_file)
+	return (output_file, len(set(ringcache.memory) - before))
+
+# The first rule is built before the pool is started, so that all of the
+# workers have its rings and only build the ones that depend on the year
+# or the variant.  The rings that they build are shared through the cache
+# directory as well.
+def build_matrix(fname, jobs=None):
+	global ring_jobs
+	work = matrix_jobs(fname)
+	if not work:
+		return
+	print("%s: %d rings built" % build_variant(work[0]), file=sys.stderr)
+	# the workers can't start pools of their own
+	ring_jobs = None
+	with worker_pool(jobs) as pool:
+		for result in pool.imap_unordered(build_variant, work[1:]):
+			print("%s: %d rings built" % result, file=sys.stderr)
+
+# the arguments for each build of --watch
+def watch_argv(argv):
+	out = []
+	skip = False
+	for arg in argv:
+		if skip:
+			skip = False
+		elif arg == "--preview":
+			skip = True
+		elif arg != "--watch" and not arg.startswith("--preview="):
+			out.append(arg)
+	return out
+
+# Frames for the makefiles and animations have their angles in minutes
+# either in the file name ("step-p,i,o.png") or one "p,i,o" per line
+def parse_frame(s):
+	(p,i,o) = [float(x)*6 for x in re.split(r"[,\s]+", s.strip())[0:3]]
+	return (p,i,o)
+
+# an optional fourth number is the seconds that the step lasts in --animate
+def parse_seconds(s):
+	x = re.split(r"[,\s]+", s.strip())
+	return float(x[3]) if len(x) > 3 else frame_seconds
+
+def read_frame_lines(fname):
+	f = sys.stdin if fname == "-" else open(fname)
+	lines = []
+	for line in f:
+		line = line.split("#")[0].strip()
+		if line == "":
+			continue
+		lines.append(line)
+	return lines
+
+def read_frames(fname):
+	return [parse_frame(line) for line in read_frame_lines(fname)]
+
+# The frames as a single svg, where the rings turn to the angles of each
+# step in turn with css animations.  They move for the first two seconds
+# of a step, the same as the transitions in the web viewer, and stay
+# there for the rest of it.
+frame_seconds = 4
+
+# the direction that each group turns for pointer, inner and outer
+spinners = [
+	("pointer", "rotate(%.3fdeg)", (+1, 0, 0)),
+	("inner", "rotate(%.3fdeg)", (0, -1, 0)),
+	("outer", "rotate(%.3fdeg)", (0, 0, -1)),
+	("back", "translate(1500px, 500px) rotate(%.3fdeg)", (0, 0, +1)),
+]
 
-if output_file.endswith(".png"):
-	d.save_png(output_file)
-else:
-	d.save_svg(output_file)
-#d.save_png('rule.png')
+def animation_css(frames, seconds, draw_back):
+	total = sum(seconds)
+	# (percent, frame) when the rings are at the angles of each frame
+	stops = [(0, frames[0])]
+	t = 0
+	for (frame, step) in zip(frames, seconds):
+		if t > 0:
+			stops.append((100 * t / total, stops[-1][1]))
+			stops.append((100 * (t + min(2, step / 2)) / total, frame))
+		t += step
+	stops.append((100, frames[-1]))
+
+	css = []
+	for (name, transform, sign) in spinners:
+		if name == "back" and not draw_back:
+			continue
+		css.append("@keyframes turn_%s {" % (name))
+		for (percent, frame) in stops:
+			angle = sum(a * s for (a, s) in zip(frame, sign))
+			css.append("%.3f%% { transform: %s; }" % (percent, transform % (angle)))
+		css.append("}")
+		css.append("#%s { animation: turn_%s %.3fs ease-in-out infinite; }" % (name, name, total))
+	return "\n".join(css)
+
+def make_animation(rings, frames, seconds, draw_back=False):
+	d = make_drawing(rings, *frames[0], draw_back=draw_back)
+	d.append_css(animation_css(frames, seconds, draw_back))
+	return d
+
+# The worker processes are handed the options that main() set, like
+# tick_paths, the constants from --params and the rings that are already
+# built by their initializer, so that they draw the same thing however
+# they are started.
+worker_rings = None
+font_file = None # the --font of --outline-text, loaded again by spawned workers
+
+def worker_state(rings=None):
+	constants = {name: v for (name, v) in globals().items() if not name.startswith("_") and ringcache.is_constant(v)}
+	return (constants, ringcache.cache_dir, ringcache.cache_size, raster.tile_size, rings)
+
+def init_worker(state):
+	global worker_rings
+	(constants, ringcache.cache_dir, ringcache.cache_size, raster.tile_size, rings) = state
+	globals().update(constants)
+	worker_rings = rings
+	if outline_text and outline.font is None:
+		outline.load(font_file)
+
+# Forked workers start the quickest and share the rings in memory, but
+# there is no fork on Windows.  Chosen when a pool is started so that
+# importing this file works everywhere.
+def pool_context():
+	if "fork" in multiprocessing.get_all_start_methods():
+		return multiprocessing.get_context("fork")
+	return multiprocessing.get_context()
+
+def worker_pool(jobs, rings=None):
+	return pool_context().Pool(jobs, initializer=init_worker, initargs=(worker_state(rings),))
+
+def render_frame(job):
+	(output_file, (p,i,o), draw_back) = job
+	d = make_drawing(worker_rings, p, i, o, draw_back)
+	save_drawing(d, output_file)
+	return output_file
+
+def render_frames(frames, output_pattern, jobs=None, draw_back=False):
+	work = [(output_pattern % (n), frame, draw_back) for (n,frame) in enumerate(frames)]
+	for dirname in set(os.path.dirname(output_file) for (output_file, frame, back) in work):
+		os.makedirs(dirname or ".", exist_ok=True)
+	# the rings are built once here instead of by each worker
+	rings = make_rings(draw_back)
+	with worker_pool(jobs, rings) as pool:
+		for output_file in pool.imap_unordered(render_frame, work):
+			print(output_file, file=sys.stderr)
+
+# For --serve the rings are built once before the pool of workers is
+# started, so that they all have them, and each request only draws them
+# at its angles.
+def serve_render(job):
+	(ext, p, i, o, draw_back) = job
+	d = make_drawing(worker_rings, p, i, o, draw_back)
+	if ext == "png":
+		return d.rasterize().png_data
+	return d.as_svg().encode("utf-8")
+
+# the angles in degrees are rounded to the precision of the drawing so
+# that the requests that draw the same thing share the cache
+def serve_job(ext, query):
+	(p, i, o) = [round(float(query.get(name, 0)), 3) for name in ("p", "i", "o")]
+	return (ext, p, i, o, query.get("back", "1") != "0")
+
+def serve_sight(query):
+	when = datetime.datetime.fromisoformat(query["date"]) if "date" in query else datetime.datetime.now(datetime.timezone.utc)
+	return sight.correct(
+		float(query["hs"]),
+		when,
+		index_error=float(query.get("ie", 0)),
+		height_of_eye=float(query.get("eye", 0)),
+		temperature=float(query.get("temp", 10)),
+		pressure=float(query.get("pressure", 1010)),
+		limb=query.get("limb", "lower"),
+		north=query.get("north", "1") != "0",
+	)
 
+def serve_routes(service):
+	async def rule_svg(query):
+		return ("image/svg+xml", await service.get(serve_job("svg", query)))
+	async def rule_png(query):
+		if raster.cairosvg is None:
+			raise server.HTTPError(501, "cairosvg is needed for png output")
+		return ("image/png", await service.get(serve_job("png", query)))
+	async def correction(query):
+		if "hs" not in query:
+			raise server.HTTPError(400, "hs, the sextant reading in degrees, is needed")
+		return server.json_response(serve_sight(query))
+	async def status(query):
+		return server.json_response(service.status())
+	return {
+		"/rule.svg": rule_svg,
+		"/rule.png": rule_png,
+		"/sight": correction,
+		"/status": status,
+	}
+
+def serve_rule(host, port, jobs=None, cache_bytes=64 << 20):
+	global worker_rings
+	worker_rings = make_rings(True)
+	service = server.RenderService(serve_render, jobs, cache_bytes,
+		initializer=init_worker, initargs=(worker_state(worker_rings),), mp_context=pool_context())
+	try:
+		server.serve(serve_routes(service), host, port)
+	finally:
+		service.close()
+
+def main(argv):
+	parser = argparse.ArgumentParser(description="Generate the sextant slide rule")
+	parser.add_argument("args", nargs="*",
+		help="pointer inner outer [draw_back [output.svg]] in degrees, or frame-p,i,o.png with the minutes in the name")
+	parser.add_argument("--frames", metavar="FILE",
+		help="render one frame for each 'pointer,inner,outer' line (in minutes) of FILE, or - for stdin")
+	parser.add_argument("-o", "--output", default="frame-%04d.png",
+		help="output file pattern for --frames (.png or .svg)")
+	parser.add_argument("-j", "--jobs", type=int, default=None,
+		help="number of worker processes for --frames and --parallel (default: all cpus)")
+	parser.add_argument("--parallel", action="store_true",
+		help="build the rings with a pool of --jobs worker processes")
+	parser.add_argument("--back", action="store_true",
+		help="include the back face in --frames")
+	parser.add_argument("--animate", action="store_true",
+		help="write --frames as a single animated svg to --output, an optional fourth number on each line is the seconds of the step")
+	parser.add_argument("--serve", metavar="PORT", type=int,
+		help="serve /rule.svg, /rule.png and /sight over http instead of writing a file")
+	parser.add_argument("--host", default="127.0.0.1",
+		help="address for --serve to listen on")
+	parser.add_argument("--render-cache", metavar="MB", type=float, default=64,
+		help="size of the cache of recent renders for --serve")
+	parser.add_argument("--params", metavar="FILE",
+		help="json file of values for the constants of the rings, like {\"year\": 2027}")
+	parser.add_argument("--matrix", metavar="FILE",
+		help="build a rule for each year and variant in the json FILE with --jobs processes")
+	parser.add_argument("--watch", action="store_true",
+		help="build again whenever the source, artwork or --params change, only the changed rings are rebuilt")
+	parser.add_argument("--preview", metavar="PORT", type=int,
+		help="with --watch, show the output on http://127.0.0.1:PORT/ and reload it after each build")
+	parser.add_argument("--profile", action="store_true",
+		help="print the time, elements, vertices and bytes of each ring")
+	parser.add_argument("--profile-json", metavar="FILE",
+		help="also write the --profile results to FILE as json")
+	parser.add_argument("--tick-paths", action="store_true",
+		help="draw each class of ticks as a single path")
+	parser.add_argument("-O", "--optimize", action="store_true",
+		help="fold transforms into the coordinates and round them for --dpi")
+	parser.add_argument("--symbols", action="store_true",
+		help="store geometry that is repeated between the rings once as a <symbol>")
+	parser.add_argument("--curves", action="store_true",
+		help="draw the sampled curves as arcs and bézier curves instead of polylines")
+	parser.add_argument("--adaptive", action="store_true",
+		help="sample the curves adaptively instead of at fixed steps")
+	parser.add_argument("--inline-art", action="store_true",
+		help="draw latitude.svg and longitude.svg inline instead of as base64 images")
+	parser.add_argument("--outline-text", action="store_true",
+		help="draw the labels as outlines of the glyphs of --font (needs fontTools)")
+	parser.add_argument("--font", metavar="FILE", default=outline.default_font,
+		help="TrueType or OpenType font for --outline-text (default: the bundled Lato)")
+	parser.add_argument("--plot", action="store_true",
+		help="write an .svg output with only the paths for a plotter, .hpgl and .gcode outputs always are")
+	parser.add_argument("--dpi", type=float, default=600,
+		help="print resolution that the --optimize and --inline-art rounding is chosen for")
+	parser.add_argument("--png-dpi", metavar="DPI", type=float,
+		help="render .png outputs at DPI in tiles with --jobs processes, for large prints")
+	parser.add_argument("--tile", metavar="PX", type=int, default=raster.tile_size,
+		help="size of the tiles for --png-dpi")
+	parser.add_argument("--split", metavar="DIR",
+		help="also write each ring as its own svg in DIR for the web viewer, with .gz and .br files")
+	parser.add_argument("--tiles", metavar="DIR",
+		help="also render each ring into a pyramid of png tiles in DIR for the web viewer")
+	parser.add_argument("--tile-levels", metavar="N", type=int, default=4,
+		help="number of levels of the --tiles pyramid, the largest is 256 * 2^(N-1) pixels")
+	parser.add_argument("--cache", metavar="DIR", default=ringcache.cache_dir,
+		help="directory for the cache of rendered rings")
+	parser.add_argument("--cache-size", metavar="MB", type=float, default=ringcache.cache_size / 2**20,
+		help="maximum size of the ring cache")
+	parser.add_argument("--no-cache", action="store_true",
+		help="rebuild every ring and don't store them")
+	opts = parser.parse_args(argv)
+	args = opts.args
+
+	if opts.params:
+		load_params(opts.params)
+	ringcache.cache_dir = None if opts.no_cache else opts.cache
+	ringcache.cache_size = int(opts.cache_size * 2**20)
+
+	global tick_paths, optimize_digits, use_symbols, curve_tolerance, sample_tolerance, ring_jobs, profile, inline_art, plot_svg, plot_tolerance, outline_text, font_file, png_dpi, png_jobs
+	tick_paths = opts.tick_paths
+	use_symbols = opts.symbols
+	inline_art = svgopt.digits_for_dpi(opts.dpi) if opts.inline_art else None
+	plot_svg = opts.plot
+	png_dpi = opts.png_dpi
+	# the frames are already rendered by a pool of workers
+	png_jobs = 1 if opts.frames else opts.jobs
+	raster.tile_size = opts.tile
+	if opts.outline_text:
+		outline_text = True
+		font_file = opts.font
+		outline.load(opts.font)
+	if opts.optimize:
+		optimize_digits = svgopt.digits_for_dpi(opts.dpi)
+	# a quarter of a printed dot
+	plot_tolerance = 96 / opts.dpi / 4
+	if opts.curves:
+		curve_tolerance = 96 / opts.dpi / 4
+	if opts.adaptive:
+		sample_tolerance = 96 / opts.dpi / 4
+	if opts.profile or opts.profile_json:
+		# the rings are timed in this process, so without --parallel
+		profile = []
+	elif opts.parallel and not opts.frames:
+		ring_jobs = opts.jobs or multiprocessing.cpu_count()
+
+	if opts.matrix:
+		build_matrix(opts.matrix, opts.jobs)
+		return
+
+	if opts.serve:
+		serve_rule(opts.host, opts.serve, opts.jobs, int(opts.render_cache * 2**20))
+		return
+
+	if opts.frames and opts.animate:
+		lines = read_frame_lines(opts.frames)
+		if not lines:
+			parser.error("no frames in %s" % (opts.frames))
+		output_file = opts.output if opts.output.endswith(".svg") else "animation.svg"
+		rings = make_rings(opts.back)
+		d = make_animation(rings, [parse_frame(x) for x in lines], [parse_seconds(x) for x in lines], opts.back)
+		save_drawing(d, output_file)
+		return
+
+	if opts.frames:
+		try:
+			opts.output % (0)
+		except (TypeError, ValueError):
+			parser.error("--output for --frames needs a %d for the number of the frame, like frame-%04d.png")
+		render_frames(read_frames(opts.frames), opts.output, opts.jobs, opts.back)
+		return
+
+	pointer_angle = 0
+	inner_angle = 0
+	outer_angle = 0
+	draw_back = True
+	output_file = "rule.svg"
+
+	if len(args) > 0 and args[0].endswith(".png"):
+		# special case for the makefiles where
+		# all the parameters are in the file name
+		output_file = args[0]
+		group = re.match(r".*-(.*,.*,.*)\.png", output_file)
+		if group:
+			(pointer_angle, inner_angle, outer_angle) = parse_frame(group[1])
+			draw_back = 0
+	elif len(args) > 0:
+		pointer_angle = float(args[0])
+	if len(args) > 1:
+		inner_angle = float(args[1])
+	if len(args) > 2:
+		outer_angle = float(args[2])
+	if len(args) > 3:
+		draw_back = int(args[3])
+	if len(args) > 4:
+		output_file = args[4]
+
+	if opts.watch:
+		extra = [opts.params] if opts.params else []
+		watch.watch(os.path.abspath(__file__), watch_argv(argv), output_file, extra, opts.preview)
+		return
+
+	rings = make_rings(draw_back)
+	d = make_drawing(rings, pointer_angle, inner_angle, outer_angle, draw_back)
+	save_drawing(d, output_file)
+	if opts.split:
+		save_split(rings, opts.split)
+	if opts.tiles:
+		save_tiles(rings, opts.tiles, opts.tile_levels, opts.jobs)
+	#d.save_png('rule.png')
+
+	if profile is not None:
+		print_profile(profile)
+		if opts.profile_json:
+			with open(opts.profile_json, "w") as f:
+				json.dump(profile, f, indent=1)
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# Families of curves for nomograms.
+#
+# A nomogram draws the curves where some value is constant over a
+# chart of two of the inputs.  The value is evaluated on a grid over
+# the chart with numpy, the iso-lines are found by marching squares on
+# all of the cells at once, and then joined into polylines.  Each line
+# is projected from the chart to the drawing and the points that are
+# not needed to stay within a tolerance of it are removed.
+#
+# Nothing here depends on the function, so any f(lat, dec, lha) that
+# works on arrays can be drawn this way.
+#
+
+import numpy as np
+
+# evaluate f over the grid of us by vs, returns an array indexed [u,v]
+def grid(f, us, vs):
+	us = np.asarray(us, dtype=float)
+	vs = np.asarray(vs, dtype=float)
+	return np.broadcast_to(f(us[:,None], vs[None,:]), (len(us), len(vs)))
+
+# For each of the 16 cases of which corners of a cell are above the
+# level, the pairs of its edges that the iso-line crosses, with -1 for
+# no segment.  The corners are numbered (0,0), (1,0), (1,1), (0,1) like
+# the bits of the case, and edge n goes from corner n to the next one.
+# Cases 5 and 10 are saddles where the middle of the cell decides which
+# pairs go together, rows 16 and 17 are for when it is above the level.
+segments = np.array([
+	((-1,-1), (-1,-1)),
+	((0,3), (-1,-1)),
+	((0,1), (-1,-1)),
+	((1,3), (-1,-1)),
+	((1,2), (-1,-1)),
+	((0,3), (1,2)),
+	((0,2), (-1,-1)),
+	((2,3), (-1,-1)),
+	((2,3), (-1,-1)),
+	((0,2), (-1,-1)),
+	((0,1), (2,3)),
+	((1,2), (-1,-1)),
+	((1,3), (-1,-1)),
+	((0,1), (-1,-1)),
+	((0,3), (-1,-1)),
+	((-1,-1), (-1,-1)),
+	((0,1), (2,3)),
+	((0,3), (1,2)),
+])
+
+# The iso-lines of z at level as a list of arrays of fractional (i,j)
+# indices into the grid.  Points exactly at the level count as below,
+# so a level at the upper end of the grid is found from the other side
+# to draw the lines at both ends.
+def marching_squares(z, level):
+	if level >= np.max(z) and level > np.min(z):
+		return marching_squares(-z, -level)
+	(n, m) = z.shape
+	above = z > level
+	case = (above[:-1,:-1] * 1
+		+ above[1:,:-1] * 2
+		+ above[1:,1:] * 4
+		+ above[:-1,1:] * 8)
+	center = (z[:-1,:-1] + z[1:,:-1] + z[1:,1:] + z[:-1,1:]) / 4 > level
+	case[(case == 5) & center] = 16
+	case[(case == 10) & center] = 17
+
+	# the numbers of the four edges of each cell with a crossing, every
+	# edge of the grid has one, first the ones along i and then along j
+	(ci, cj) = np.nonzero((case != 0) & (case != 15))
+	along_i = lambda i, j: i * m + j
+	along_j = lambda i, j: (n-1) * m + i * (m-1) + j
+	cell_edges = np.column_stack((
+		along_i(ci, cj),
+		along_j(ci+1, cj),
+		along_i(ci, cj+1),
+		along_j(ci, cj),
+	))
+	pairs = segments[case[ci, cj]]
+	valid = pairs[:,:,0] >= 0
+	rows = np.broadcast_to(np.arange(len(ci))[:,None], valid.shape)[valid]
+	a = cell_edges[rows, pairs[:,:,0][valid]]
+	b = cell_edges[rows, pairs[:,:,1][valid]]
+
+	# only the edges that are crossed are kept, numbered from 0
+	(edge, ends) = np.unique(np.concatenate((a, b)), return_inverse=True)
+	others = np.concatenate((ends[len(a):], ends[:len(a)]))
+
+	# and the point where the line crosses each of them
+	on_j = edge >= (n-1) * m
+	(ei, ej) = np.divmod(np.where(on_j, edge - (n-1) * m, edge), np.where(on_j, m-1, m))
+	(zi, zj) = (ei + ~on_j, ej + on_j)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		t = (level - z[ei, ej]) / (z[zi, zj] - z[ei, ej])
+	px = ei + np.where(on_j, 0, t)
+	py = ej + np.where(on_j, t, 0)
+
+	# each edge is in at most two segments, these are its neighbours
+	order = np.argsort(ends, kind="stable")
+	ends = ends[order]
+	others = others[order]
+	second = np.zeros(len(ends), dtype=int)
+	second[1:] = ends[1:] == ends[:-1]
+	links = np.full((len(edge), 2), -1)
+	links[ends, second] = others
+	degree = np.bincount(ends, minlength=len(edge))
+
+	# walk each line from one of its ends, and then the closed loops
+	links = links.tolist()
+	seen = bytearray(len(px))
+	lines = []
+	for start in np.concatenate((np.flatnonzero(degree == 1), np.flatnonzero(degree == 2))).tolist():
+		if seen[start]:
+			continue
+		seen[start] = 1
+		line = [start]
+		(prev, k) = (-1, start)
+		while True:
+			(n0, n1) = links[k]
+			nxt = n1 if n0 == prev else n0
+			if nxt == start and len(line) > 2:
+				line.append(start)
+				break
+			if nxt < 0 or seen[nxt]:
+				break
+			seen[nxt] = 1
+			line.append(nxt)
+			(prev, k) = (k, nxt)
+		lines.append(np.column_stack((px[line], py[line])))
+	return lines
+
+# Ramer-Douglas-Peucker like curves.simplify(), but with the distances
+# of all of the points of a span computed at once, returns the indices
+# of the points to keep
+def simplify(xy, tolerance):
+	keep = np.zeros(len(xy), dtype=bool)
+	keep[[0, -1]] = True
+	todo = [(0, len(xy)-1)]
+	while todo:
+		(i, j) = todo.pop()
+		if j - i < 2:
+			continue
+		(a, b) = (xy[i], xy[j])
+		p = xy[i+1:j] - a
+		ab = b - a
+		l = ab @ ab
+		if l != 0:
+			p -= np.clip((p @ ab) / l, 0, 1)[:,None] * ab
+		d = np.hypot(p[:,0], p[:,1])
+		k = np.argmax(d)
+		if d[k] > tolerance:
+			keep[i+1+k] = True
+			todo.append((i, i+1+k))
+			todo.append((i+1+k, j))
+	return np.flatnonzero(keep)
+
+# fractional indices into us and vs to values
+def index_values(xs, idx):
+	i = np.clip(np.floor(idx).astype(int), 0, len(xs) - 2)
+	return xs[i] + (idx - i) * (xs[i+1] - xs[i])
+
+# The iso-lines of z over the grid of us by vs at each of the levels,
+# projected to the drawing by project(u, v) -> (x, y) on arrays and
+# simplified to within tolerance.  Returns a list of the level and the
+# lines at that level as arrays of (x, y) points.
+def contours(z, us, vs, levels, project, tolerance=None):
+	us = np.asarray(us, dtype=float)
+	vs = np.asarray(vs, dtype=float)
+	result = []
+	for level in levels:
+		lines = []
+		for idx in marching_squares(z, level):
+			(x, y) = project(index_values(us, idx[:,0]), index_values(vs, idx[:,1]))
+			xy = np.column_stack(np.broadcast_arrays(x, y))
+			if tolerance is not None and len(xy) > 2:
+				xy = xy[simplify(xy, tolerance)]
+			lines.append(xy)
+		result.append((level, lines))
+	return result
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# Convert the text of the rings into outlines.
+#
+# Each glyph of the font is turned into a path once and stored in the
+# <defs>, and every character of a label is a <use> of it.  The drawing
+# then looks the same whatever fonts the renderer has, and the plotter
+# export can draw the labels.  There is no kerning and italic text is
+# slanted, which is enough for the short labels on the rule.
+#
+# Needs fontTools and a TrueType or OpenType font.  Lato is in fonts/
+# (under the SIL Open Font License in fonts/OFL.txt) so that the outlines
+# don't depend on the fonts of the machine, another one can be given.
+#
+
+import os
+import re
+import io
+import hashlib
+import xml.etree.ElementTree as ET
+import svgopt
+
+try:
+	from fontTools.ttLib import TTFont
+	from fontTools.pens.svgPathPen import SVGPathPen
+	from fontTools.pens.transformPen import TransformPen
+except ImportError:
+	TTFont = None
+
+default_font = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts", "Lato-Regular.ttf")
+slant = 12 # degrees that italic text leans over
+default_size = 16
+
+# attributes that are used up by the layout, the rest stay on the group
+text_attributes = ["x", "y", "dx", "dy", "font-size", "font-style", "font-family",
+	"font-weight", "text-anchor", "align", "transform"]
+
+class Font:
+	def __init__(self, path):
+		if TTFont is None:
+			raise RuntimeError("fontTools is needed to convert text to outlines")
+		with open(path, "rb") as f:
+			data = f.read()
+		self.path = path
+		self.hash = hashlib.sha256(data).hexdigest()
+		self.name = re.sub(r"[^A-Za-z0-9]", "", os.path.splitext(os.path.basename(path))[0])
+		self.font = TTFont(io.BytesIO(data))
+		self.glyph_set = self.font.getGlyphSet()
+		self.cmap = self.font.getBestCmap()
+		self.hmtx = self.font["hmtx"]
+		self.scale = 1 / self.font["head"].unitsPerEm
+		self.paths = {}
+
+	def glyph_name(self, ch):
+		return self.cmap.get(ord(ch), ".notdef")
+
+	def glyph_id(self, name):
+		return "gl_%s_%s" % (self.name, re.sub(r"[^A-Za-z0-9_-]", "_", name))
+
+	# advance in em
+	def advance(self, name):
+		return self.hmtx[name][0] * self.scale
+
+	# the outline of a glyph in em with y down, None if it is blank
+	def glyph_path(self, name):
+		if name not in self.paths:
+			pen = SVGPathPen(self.glyph_set, ntos=lambda x: svgopt.fmt_num(x, 4))
+			self.glyph_set[name].draw(TransformPen(pen, (self.scale, 0, 0, -self.scale, 0, 0)))
+			self.paths[name] = pen.getCommands() or None
+		return self.paths[name]
+
+	# the <defs> for the glyphs with these ids
+	def defs(self, ids):
+		by_id = {self.glyph_id(name): name for name in self.glyph_set.keys()}
+		out = []
+		for glyph_id in sorted(set(ids)):
+			if glyph_id in by_id:
+				out.append('<path id="%s" d="%s" />' % (glyph_id, self.glyph_path(by_id[glyph_id])))
+		return "\n".join(out)
+
+font = None
+
+def load(path):
+	global font
+	if path is None:
+		raise RuntimeError("--outline-text needs a font file, give one with --font")
+	font = Font(path)
+	return font
+
+####
+#### Text layout
+####
+
+def em(value, size):
+	if value is None:
+		return 0
+	if value.endswith("em"):
+		return float(value[:-2]) * size
+	return float(re.sub(r"(px)?$", "", value))
+
+# the glyphs of one line at x,y as a group of <use>
+def line_group(text, x, y, size, anchor, italic):
+	uses = []
+	advance = 0
+	for ch in text:
+		name = font.glyph_name(ch)
+		if font.glyph_path(name) is not None:
+			uses.append(ET.Element("use", {"xlink:href": "#" + font.glyph_id(name)}))
+			if advance != 0:
+				uses[-1].set("x", svgopt.fmt_num(advance, 4))
+		advance += font.advance(name)
+
+	if anchor == "middle":
+		x -= advance * size / 2
+	elif anchor == "end":
+		x -= advance * size
+
+	transform = "translate(%s %s)" % (svgopt.fmt_num(x, 3), svgopt.fmt_num(y, 3))
+	if italic:
+		transform += " skewX(%d)" % (-slant)
+	transform += " scale(%s)" % (svgopt.fmt_num(size, 3))
+	g = ET.Element("g", {"transform": transform})
+	g.extend(uses)
+	return g
+
+def text_lines(elem, size):
+	x = em(elem.get("x"), size)
+	y = em(elem.get("y"), size)
+	lines = []
+	if elem.text:
+		lines.append((elem.text, x, y))
+	for tspan in elem:
+		if "x" in tspan.attrib:
+			x = em(tspan.get("x"), size)
+		if "y" in tspan.attrib:
+			y = em(tspan.get("y"), size)
+		y += em(tspan.get("dy"), size)
+		if tspan.text:
+			lines.append((tspan.text, x, y))
+	return lines
+
+def outline_text(elem, inherited):
+	size = em(elem.get("font-size", inherited.get("font-size", str(default_size))), default_size)
+	anchor = elem.get("text-anchor", inherited.get("text-anchor", "start"))
+	italic = elem.get("font-style", inherited.get("font-style")) in ("italic", "oblique")
+
+	g = ET.Element("g")
+	if "transform" in elem.attrib:
+		g.set("transform", elem.get("transform"))
+	for (k, v) in elem.attrib.items():
+		if k not in text_attributes:
+			g.set(k, v)
+	if "stroke-width" in g.attrib:
+		# the glyphs are drawn in em
+		g.set("stroke-width", svgopt.fmt_num(float(g.get("stroke-width")) / size, 4))
+
+	lines = [line_group(text, x, y, size, anchor, italic) for (text, x, y) in text_lines(elem, size)]
+	if len(lines) == 1:
+		# one line, the common case, only needs one group
+		line = lines[0]
+		transform = (g.get("transform", "") + " " + line.get("transform")).strip()
+		g.set("transform", transform)
+		g.extend(list(line))
+	else:
+		g.extend(lines)
+	return g
+
+def replace_text(parent, inherited):
+	inherited = dict(inherited)
+	for name in ("font-size", "text-anchor", "font-style"):
+		if name in parent.attrib:
+			inherited[name] = parent.get(name)
+	for (i, child) in enumerate(list(parent)):
+		if child.tag == "text":
+			g = outline_text(child, inherited)
+			g.tail = child.tail
+			parent.remove(child)
+			parent.insert(i, g)
+		else:
+			replace_text(child, inherited)
+
+# replace the <text> in a fragment of svg elements, the glyphs that
+# it uses have to be added to the <defs> with glyph_defs()
+def outline_fragment(fragment):
+	root = ET.fromstring('<g xmlns="%s" xmlns:xlink="%s">%s</g>' % (svgopt.SVG_NS, svgopt.XLINK_NS, fragment))
+	svgopt.strip_namespaces(root)
+	replace_text(root, {})
+	svgopt.tidy(root)
+	return "".join(ET.tostring(child, encoding="unicode") for child in root).rstrip("\n")
+
+def glyph_defs(fragments):
+	ids = []
+	for fragment in fragments:
+		ids.extend(re.findall(r'xlink:href="#(gl_[^"]+)"', fragment))
+	return font.defs(ids)
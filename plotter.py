@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+# Export of the rule for pen plotters and laser cutters.
+#
+# The drawing is flattened into polylines in millimeters on two layers,
+# "cut" for the elements with class="cut" (the edges of the discs and
+# the axle) and "engrave" for everything else that has a stroke or fill,
+# except for the pointer which is made separately.
+# Strokes that meet end to end are merged into one polyline, and the
+# polylines are ordered to keep the pen-up travel short with a nearest
+# neighbour tour that is then improved with 2-opt moves.
+#
+# The output is HPGL (.hpgl, .plt), G-code for a laser (.gcode, .nc) or
+# an svg with only the ordered paths.  Text is not plotted.
+#
+
+from math import sqrt, ceil, acos, atan2, cos, sin, radians, pi
+import sys
+import xml.etree.ElementTree as ET
+import numpy as np
+import svgopt
+import curves
+
+mm_per_unit = 25.4 / 96 # svg user units are css pixels
+
+# Laser settings for each layer in the G-code, the engraving is done
+# first and the cuts last so that the parts don't move while engraving.
+layers = {
+	"engrave": {"power": 300, "feed": 3000, "pen": 1},
+	"cut": {"power": 1000, "feed": 600, "pen": 2},
+}
+
+hidden = ("defs", "symbol", "marker", "clipPath", "mask", "pattern", "style", "script",
+	"title", "desc", "metadata", "image", "text")
+
+# the pointer is a separate part that turns over the discs, it is not
+# engraved on them
+parts = ("pointer",)
+
+####
+#### Flattening the svg into polylines
+####
+
+def style_value(elem, name):
+	for prop in elem.get("style", "").split(";"):
+		if ":" in prop:
+			(k,v) = prop.split(":", 1)
+			if k.strip() == name:
+				return v.strip()
+	return elem.get(name)
+
+# an ellipse or circle as a polygon that is within tolerance of it
+def ellipse_points(cx, cy, rx, ry, tolerance):
+	r = max(rx, ry)
+	if r <= tolerance:
+		return [(cx, cy)]
+	n = max(8, int(ceil(pi / acos(1 - tolerance / r))))
+	return [(cx + rx * cos(2*pi*i/n), cy + ry * sin(2*pi*i/n)) for i in range(n+1)]
+
+# the center parameterization of an svg arc, returns a function of t in 0..1
+def arc_function(x1, y1, rx, ry, phi, large, sweep, x2, y2):
+	(c, s) = (cos(radians(phi)), sin(radians(phi)))
+	dx = (x1 - x2) / 2
+	dy = (y1 - y2) / 2
+	x1p = c * dx + s * dy
+	y1p = -s * dx + c * dy
+	(rx, ry) = (abs(rx), abs(ry))
+	scale = (x1p*x1p) / (rx*rx) + (y1p*y1p) / (ry*ry)
+	if scale > 1:
+		rx *= sqrt(scale)
+		ry *= sqrt(scale)
+	n = rx*rx*ry*ry - rx*rx*y1p*y1p - ry*ry*x1p*x1p
+	den = rx*rx*y1p*y1p + ry*ry*x1p*x1p
+	k = sqrt(max(0, n / den)) if den != 0 else 0
+	if large == sweep:
+		k = -k
+	cxp = k * rx * y1p / ry
+	cyp = -k * ry * x1p / rx
+	cx = c * cxp - s * cyp + (x1 + x2) / 2
+	cy = s * cxp + c * cyp + (y1 + y2) / 2
+	a1 = atan2((y1p - cyp) / ry, (x1p - cxp) / rx)
+	a2 = atan2((-y1p - cyp) / ry, (-x1p - cxp) / rx)
+	da = a2 - a1
+	if sweep and da < 0:
+		da += 2*pi
+	elif not sweep and da > 0:
+		da -= 2*pi
+	def f(t):
+		a = a1 + da * t
+		return (cx + c * rx * cos(a) - s * ry * sin(a), cy + s * rx * cos(a) + c * ry * sin(a))
+	return f
+
+def sample(f, tolerance):
+	return [f(t) for t in curves.adaptive_params(f, 0, 1, tolerance, min_depth=3)[1:]]
+
+def reflect(c, p):
+	return (2*p[0] - c[0], 2*p[1] - c[1])
+
+# the path data as a list of polylines
+def path_polylines(d, tolerance):
+	lines = []
+	line = None
+	prev = ("", None) # the last command and its second control point
+	for (cmd, v) in svgopt.parse_path(d):
+		if cmd == "M":
+			line = [(v[0], v[1])]
+			lines.append(line)
+			prev = (cmd, None)
+			continue
+		if line is None:
+			line = [(0, 0)]
+			lines.append(line)
+		p = line[-1]
+		control = None
+		if cmd == "Z":
+			line.append(line[0])
+			line = [line[0]]
+			lines.append(line)
+		elif cmd == "L":
+			line.append((v[0], v[1]))
+		elif cmd in "CS":
+			if cmd == "S":
+				c1 = reflect(prev[1], p) if prev[0] in "CS" else p
+				v = list(c1) + v
+			b = (p, (v[0], v[1]), (v[2], v[3]), (v[4], v[5]))
+			line.extend(sample(lambda t: curves.bezier(b, t), tolerance))
+			control = b[2]
+		elif cmd in "QT":
+			if cmd == "T":
+				q = reflect(prev[1], p) if prev[0] in "QT" else p
+				v = list(q) + v
+			b = (p, (p[0] + (v[0]-p[0])*2/3, p[1] + (v[1]-p[1])*2/3),
+				(v[2] + (v[0]-v[2])*2/3, v[3] + (v[1]-v[3])*2/3), (v[2], v[3]))
+			line.extend(sample(lambda t: curves.bezier(b, t), tolerance))
+			control = (v[0], v[1])
+		elif cmd == "A":
+			if v[0] == 0 or v[1] == 0 or (p[0], p[1]) == (v[5], v[6]):
+				line.append((v[5], v[6]))
+			else:
+				line.extend(sample(arc_function(p[0], p[1], *v), tolerance))
+		prev = (cmd, control)
+	return [l for l in lines if len(l) > 1]
+
+def num(elem, name):
+	return float(elem.get(name, 0))
+
+# the polylines of one element in its own coordinates
+def shape_polylines(elem, tag, tolerance):
+	if tag == "path":
+		return path_polylines(elem.get("d", ""), tolerance)
+	if tag == "circle":
+		return [ellipse_points(num(elem, "cx"), num(elem, "cy"), num(elem, "r"), num(elem, "r"), tolerance)]
+	if tag == "ellipse":
+		return [ellipse_points(num(elem, "cx"), num(elem, "cy"), num(elem, "rx"), num(elem, "ry"), tolerance)]
+	if tag == "line":
+		return [[(num(elem, "x1"), num(elem, "y1")), (num(elem, "x2"), num(elem, "y2"))]]
+	if tag in ("polyline", "polygon"):
+		v = [float(x) for x in svgopt.number_re.findall(elem.get("points", ""))]
+		pts = list(zip(v[0::2], v[1::2]))
+		if tag == "polygon" and pts:
+			pts.append(pts[0])
+		return [pts]
+	if tag == "rect":
+		(x, y, w, h) = (num(elem, "x"), num(elem, "y"), num(elem, "width"), num(elem, "height"))
+		return [[(x, y), (x+w, y), (x+w, y+h), (x, y+h), (x, y)]]
+	return []
+
+# the transform from the viewBox of a nested svg, with the default xMidYMid meet
+def viewbox_matrix(elem):
+	(x, y) = (num(elem, "x"), num(elem, "y"))
+	m = (1, 0, 0, 1, x, y)
+	vb = [float(v) for v in svgopt.number_re.findall(elem.get("viewBox", ""))]
+	if len(vb) != 4 or "width" not in elem.attrib or "height" not in elem.attrib:
+		return m
+	(w, h) = (num(elem, "width"), num(elem, "height"))
+	s = min(w / vb[2], h / vb[3])
+	tx = x + (w - vb[2] * s) / 2 - vb[0] * s
+	ty = y + (h - vb[3] * s) / 2 - vb[1] * s
+	return (s, 0, 0, s, tx, ty)
+
+class Flattener:
+	def __init__(self, root, tolerance):
+		self.root = root
+		self.ids = {e.get("id"): e for e in root.iter() if "id" in e.attrib}
+		self.tolerance = tolerance
+		self.layers = {name: [] for name in layers}
+		self.skipped = {}
+
+	def walk(self, elem, m, layer, visible, used=False):
+		tag = elem.tag
+		if tag in hidden and not (used and tag == "symbol"):
+			if tag in ("text", "image"):
+				self.skipped[tag] = self.skipped.get(tag, 0) + 1
+			return
+		if style_value(elem, "display") == "none" or style_value(elem, "visibility") == "hidden":
+			return
+		if elem.get("id") in parts:
+			return
+		if "cut" in elem.get("class", "").split():
+			layer = "cut"
+		stroke = style_value(elem, "stroke")
+		fill = style_value(elem, "fill")
+		visible = dict(visible)
+		if stroke is not None:
+			visible["stroke"] = stroke != "none"
+		if fill is not None:
+			visible["fill"] = fill != "none"
+
+		m = svgopt.mat_mul(m, svgopt.parse_transform(elem.get("transform")))
+		if tag == "svg" and elem is not self.root:
+			m = svgopt.mat_mul(m, viewbox_matrix(elem))
+
+		if tag == "use":
+			ref = self.ids.get((elem.get("xlink:href") or elem.get("href") or "#")[1:])
+			if ref is not None:
+				m = svgopt.mat_mul(m, (1, 0, 0, 1, num(elem, "x"), num(elem, "y")))
+				self.walk(ref, m, layer, visible, used=True)
+			return
+
+		if tag in ("svg", "g", "a", "symbol"):
+			for child in elem:
+				self.walk(child, m, layer, visible)
+			return
+
+		if not (visible["stroke"] or visible["fill"]):
+			return
+		# keep the same tolerance in the output
+		scale = svgopt.mat_scale(m) or 1
+		for line in shape_polylines(elem, tag, self.tolerance / scale):
+			self.layers[layer].append([svgopt.mat_apply(m, x, y) for (x,y) in line])
+
+def flatten(svg, tolerance):
+	root = ET.fromstring(svg.encode("utf-8"))
+	svgopt.strip_namespaces(root)
+	f = Flattener(root, tolerance)
+	f.walk(root, (1, 0, 0, 1, 0, 0), "engrave", {"stroke": False, "fill": True})
+	return f
+
+####
+#### Merging and ordering
+####
+
+# join polylines that end where another one starts, turning them
+# around when that makes them meet
+def merge_polylines(lines, eps=1e-3):
+	def key(p):
+		return (round(p[0] / eps), round(p[1] / eps))
+
+	# the same stroke drawn twice, like the axle on both discs, is only
+	# plotted once, and closed loops have nothing to join
+	seen = set()
+	closed = []
+	unique = []
+	for l in lines:
+		k = tuple(key(p) for p in l)
+		if len(l) < 2 or k in seen or k[::-1] in seen:
+			continue
+		seen.add(k)
+		if k[0] == k[-1]:
+			closed.append(list(l))
+		else:
+			unique.append(list(l))
+	lines = unique
+
+	ends = {}
+	for (i, l) in enumerate(lines):
+		ends.setdefault(key(l[0]), set()).add(i)
+		ends.setdefault(key(l[-1]), set()).add(i)
+
+	def take(i):
+		for p in (lines[i][0], lines[i][-1]):
+			ends[key(p)].discard(i)
+
+	out = []
+	used = [False] * len(lines)
+	for i in range(len(lines)):
+		if used[i]:
+			continue
+		used[i] = True
+		take(i)
+		line = lines[i]
+		# grow the end, then turn it around and grow the other end
+		for direction in range(2):
+			while True:
+				candidates = ends.get(key(line[-1]))
+				if not candidates:
+					break
+				j = min(candidates)
+				used[j] = True
+				take(j)
+				other = lines[j]
+				if key(other[0]) != key(line[-1]):
+					other = other[::-1]
+				line = line + other[1:]
+			line = line[::-1]
+		out.append(line)
+	return closed + out
+
+# Visit the polylines in the order of a nearest neighbour tour from
+# start, flipping them so that each one starts at its nearest end.
+# The ends are kept in a grid so that only the nearby cells are searched.
+def nearest_neighbour(lines, start=(0, 0)):
+	n = len(lines)
+	xs = [p[0] for l in lines for p in (l[0], l[-1])]
+	ys = [p[1] for l in lines for p in (l[0], l[-1])]
+	(x0, y0) = (min(xs), min(ys))
+	size = max(sqrt((max(xs) - x0) * (max(ys) - y0) / n), 1e-6)
+	def cell(p):
+		return (int((p[0] - x0) // size), int((p[1] - y0) // size))
+	(cols, rows) = cell((max(xs), max(ys)))
+
+	grid = {}
+	for (i, l) in enumerate(lines):
+		grid.setdefault(cell(l[0]), []).append((i, False))
+		grid.setdefault(cell(l[-1]), []).append((i, True))
+
+	left = [True] * n
+	pos = start
+	order = []
+	for k in range(n):
+		(cx, cy) = cell(pos)
+		best = None
+		r = 0
+		# nothing in ring r can be closer than (r-1) cells
+		while best is None or best[0] > (r - 1) * size:
+			if r > max(cols, rows) + abs(cx) + abs(cy) + 1:
+				break
+			for gx in range(cx - r, cx + r + 1):
+				for gy in range(cy - r, cy + r + 1):
+					if max(abs(gx - cx), abs(gy - cy)) != r:
+						continue
+					entries = grid.get((gx, gy))
+					if not entries:
+						continue
+					entries[:] = [e for e in entries if left[e[0]]]
+					for (i, flip) in entries:
+						p = lines[i][-1] if flip else lines[i][0]
+						d = sqrt((p[0] - pos[0])**2 + (p[1] - pos[1])**2)
+						if best is None or d < best[0]:
+							best = (d, i, flip)
+			r += 1
+		(d, i, flip) = best
+		left[i] = False
+		order.append((i, flip))
+		pos = lines[i][0] if flip else lines[i][-1]
+	return [lines[i][::-1] if flip else lines[i] for (i, flip) in order]
+
+# Improve the tour with 2-opt moves that reverse a run of polylines,
+# only looking a window of polylines ahead to keep it fast
+def two_opt(lines, window=64, passes=4, start=(0, 0)):
+	n = len(lines)
+	if n < 3:
+		return lines
+	lines = list(lines)
+	s = np.array([l[0] for l in lines], dtype=float)
+	e = np.array([l[-1] for l in lines], dtype=float)
+	for p in range(passes):
+		improved = False
+		for i in range(-1, n - 2):
+			# the pen is at a, the end of polyline i, then travels to b
+			a = e[i] if i >= 0 else np.array(start, dtype=float)
+			b = s[i+1]
+			j = np.arange(i+2, min(n, i+2+window))
+			c = e[j]
+			# after the last polyline there is no travel
+			d = np.where((j + 1 < n)[:,None], s[np.minimum(j+1, n-1)], c)
+			old = np.hypot(*(a - b).T) + np.hypot(*(c - d).T)
+			new = np.hypot(*(a - c).T) + np.hypot(*(b - d).T)
+			gain = old - new
+			k = int(np.argmax(gain))
+			if gain[k] <= 1e-9:
+				continue
+			j = j[k]
+			# reverse the run i+1..j, and each polyline in it
+			lines[i+1:j+1] = [l[::-1] for l in reversed(lines[i+1:j+1])]
+			(s[i+1:j+1], e[i+1:j+1]) = (e[i+1:j+1][::-1].copy(), s[i+1:j+1][::-1].copy())
+			improved = True
+		if not improved:
+			break
+	return lines
+
+def travel(lines, start=(0, 0)):
+	total = 0
+	pos = start
+	for l in lines:
+		total += sqrt((l[0][0]-pos[0])**2 + (l[0][1]-pos[1])**2)
+		pos = l[-1]
+	return total
+
+def order_layer(lines):
+	lines = merge_polylines(lines)
+	if len(lines) == 0:
+		return lines
+	return two_opt(nearest_neighbour(lines))
+
+# cut the holes and the inner discs before the outer discs that hold them
+def order_cuts(lines):
+	lines = merge_polylines(lines)
+	def size(l):
+		xs = [p[0] for p in l]
+		ys = [p[1] for p in l]
+		return (max(xs) - min(xs)) * (max(ys) - min(ys))
+	return sorted(lines, key=size)
+
+####
+#### Output formats
+####
+
+def to_mm(lines, height):
+	# flip y, the machines have it going up
+	return [[(x * mm_per_unit, (height - y) * mm_per_unit) for (x,y) in l] for l in lines]
+
+def write_hpgl(f, plot, width, height):
+	f.write("IN;\n")
+	for (name, lines) in plot.items():
+		f.write("SP%d;\n" % (layers[name]["pen"]))
+		for l in to_mm(lines, height):
+			# 40 plotter units per mm
+			pts = ["%d,%d" % (round(x * 40), round(y * 40)) for (x,y) in l]
+			f.write("PU%s;PD%s;\n" % (pts[0], ",".join(pts[1:])))
+	f.write("PU;SP0;\n")
+
+def write_gcode(f, plot, width, height):
+	f.write("G21 ; mm\nG90 ; absolute\nM5\n")
+	for (name, lines) in plot.items():
+		settings = layers[name]
+		f.write("; layer %s\n" % (name))
+		for l in to_mm(lines, height):
+			f.write("G0 X%.3f Y%.3f\n" % l[0])
+			f.write("M3 S%d\n" % (settings["power"]))
+			f.write("G1 F%d\n" % (settings["feed"]))
+			for (x,y) in l[1:]:
+				f.write("X%.3f Y%.3f\n" % (x, y))
+			f.write("M5\n")
+	f.write("G0 X0 Y0\nM2\n")
+
+def write_svg(f, plot, width, height):
+	colors = {"engrave": "black", "cut": "red"}
+	f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+	f.write('<svg xmlns="http://www.w3.org/2000/svg" width="%smm" height="%smm" viewBox="0 0 %s %s">\n' % (
+		svgopt.fmt_num(width * mm_per_unit, 3), svgopt.fmt_num(height * mm_per_unit, 3),
+		svgopt.fmt_num(width, 3), svgopt.fmt_num(height, 3)))
+	for (name, lines) in plot.items():
+		f.write('<g id="%s" fill="none" stroke="%s" stroke-width="0.1">\n' % (name, colors[name]))
+		for l in lines:
+			f.write('<path d="%s" />\n' % (svgopt.fmt_path([("M", list(l[0]))] + [("L", list(p)) for p in l[1:]], 3)))
+		f.write("</g>\n")
+	f.write("</svg>\n")
+
+formats = {
+	".hpgl": write_hpgl,
+	".plt": write_hpgl,
+	".gcode": write_gcode,
+	".nc": write_gcode,
+	".svg": write_svg,
+}
+
+# Write a complete svg document for a plotter, the format is from the
+# extension of the file name.  The tolerance for the curves is in svg units.
+def save(svg, fname, tolerance=0.05, log=sys.stderr):
+	ext = fname[fname.rfind("."):].lower()
+	root = ET.fromstring(svg.encode("utf-8"))
+	width = float(root.get("width"))
+	height = float(root.get("height"))
+
+	flat = flatten(svg, tolerance)
+	plot = {
+		"engrave": order_layer(flat.layers["engrave"]),
+		"cut": order_cuts(flat.layers["cut"]),
+	}
+	if log is not None:
+		for (name, lines) in plot.items():
+			print("%s: %d polylines from %d, %.0f mm of travel instead of %.0f" % (
+				name, len(lines), len(flat.layers[name]),
+				travel(lines) * mm_per_unit, travel(flat.layers[name]) * mm_per_unit), file=log)
+		for (tag, count) in flat.skipped.items():
+			print("%s: %d not plotted" % (tag, count), file=log)
+
+	with open(fname, "w") as f:
+		formats[ext](f, plot, width, height)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# Tiled png export for large prints.
+#
+# drawsvg renders the whole drawing into one image in memory, which for
+# the rule at 1200 dpi is 25000 by 12500 pixels and a few gigabytes.
+# Here the drawing is cut into square tiles by changing its viewBox, the
+# tiles are rendered by a pool of worker processes, and each band of
+# tiles is stitched together and compressed into the png as soon as it
+# is done.  Only two bands are ever in memory, whatever the resolution.
+#
+# The same tiles make the level of detail pyramids of the rings for the
+# web viewer, which rotates them as images instead of as svg.
+#
+# Needs cairosvg, the same as the png output of drawsvg.
+#
+
+import io
+import os
+import re
+import sys
+import json
+import math
+import zlib
+import struct
+import multiprocessing
+import numpy as np
+
+try:
+	import cairosvg
+	from cairosvg.parser import Tree
+	from cairosvg.surface import PNGSurface
+	from PIL import Image
+except (ImportError, OSError):
+	# cairosvg raises OSError when it can't find the cairo library
+	cairosvg = None
+
+tile_size = 512 # pixels on a side
+
+svg_re = re.compile(r"<svg\b[^>]*>")
+
+# the width and height of the drawing in svg units from its viewBox
+def svg_size(svg):
+	root = svg_re.search(svg)[0]
+	view_box = re.search(r'viewBox="([^"]*)"', root)
+	if view_box:
+		return tuple(float(x) for x in view_box[1].replace(",", " ").split()[2:4])
+	return tuple(float(re.search(r'%s="([0-9.]+)' % name, root)[1]) for name in ("width", "height"))
+
+# the tiles of one row of the image as (x, y, w, h) in pixels
+def tile_bands(width, height, size):
+	for y in range(0, height, size):
+		yield [(x, y, min(size, width - x), min(size, height - y)) for x in range(0, width, size)]
+
+####
+#### Rendering, in the workers
+####
+
+# the documents that are being rendered by name, each one is parsed
+# once by each worker and only the size and viewBox of its root change
+# from one tile to the next
+worker_trees = {}
+
+def init_worker(svgs):
+	global worker_trees
+	worker_trees = {name: Tree(bytestring=svg.encode("utf-8")) for (name, svg) in svgs.items()}
+
+# one tile of the document name at scale pixels per unit, as an array
+# of h rows of w RGBA pixels.  It shows the rectangle x,y,w,h / scale of
+# the drawing, so tiles with the same scale that are shifted by whole
+# pixels line up exactly and there are no seams between them.
+def render_tile(job):
+	(name, scale, x, y, w, h) = job
+	s = scale
+	tree = worker_trees[name]
+	tree["width"] = str(w)
+	tree["height"] = str(h)
+	tree["viewBox"] = "%r %r %r %r" % (x / s, y / s, w / s, h / s)
+	png = io.BytesIO()
+	PNGSurface(tree, png, 96).finish()
+	png.seek(0)
+	return np.asarray(Image.open(png).convert("RGBA"))
+
+####
+#### Streaming png output
+####
+
+def write_chunk(f, kind, data):
+	f.write(struct.pack(">I", len(data)))
+	f.write(kind)
+	f.write(data)
+	f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+class PNGWriter:
+	def __init__(self, f, width, height, dpi=None):
+		self.f = f
+		self.width = width
+		self.rows = 0
+		self.height = height
+		self.prev = np.zeros(width * 4, dtype=np.uint8)
+		self.z = zlib.compressobj(6)
+
+		f.write(b"\x89PNG\r\n\x1a\n")
+		# 8 bit RGBA, not interlaced
+		write_chunk(f, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+		if dpi is not None:
+			ppm = int(round(dpi / 0.0254))
+			write_chunk(f, b"pHYs", struct.pack(">IIB", ppm, ppm, 1))
+
+	# add a band of rows as an array of (rows, width, 4)
+	def write(self, band):
+		rows = band.reshape(len(band), self.width * 4)
+		# the "up" filter, the difference from the row above,
+		# compresses the long straight lines of the rule well
+		out = np.empty((len(rows), self.width * 4 + 1), dtype=np.uint8)
+		out[:,0] = 2
+		out[0,1:] = rows[0] - self.prev
+		out[1:,1:] = rows[1:] - rows[:-1]
+		self.prev = rows[-1].copy()
+		self.rows += len(rows)
+		data = self.z.compress(out.tobytes())
+		if data:
+			write_chunk(self.f, b"IDAT", data)
+
+	def close(self):
+		if self.rows != self.height:
+			raise ValueError("png has %d rows instead of %d" % (self.rows, self.height))
+		write_chunk(self.f, b"IDAT", self.z.flush())
+		write_chunk(self.f, b"IEND", b"")
+
+# Render an svg document into a png file at dpi, with 96 svg units to the
+# inch, in tiles of tile pixels on a side with a pool of jobs processes
+# started by mp_context (or the default one of multiprocessing).
+def save_png(svg, fname, dpi, jobs=None, tile=None, log=sys.stderr, mp_context=None):
+	if cairosvg is None:
+		raise RuntimeError("cairosvg is needed for png output")
+	tile = tile or tile_size
+	scale = dpi / 96
+	(w, h) = svg_size(svg)
+	width = int(round(w * scale))
+	height = int(round(h * scale))
+	bands = list(tile_bands(width, height, tile))
+	if log:
+		print("%s: %d x %d pixels in %d tiles" % (fname, width, height, sum(map(len, bands))), file=log)
+
+	with open(fname, "wb") as f:
+		png = PNGWriter(f, width, height, dpi)
+		bands = [[(None, scale) + t for t in band] for band in bands]
+		if jobs == 1:
+			init_worker({None: svg})
+			for band in bands:
+				png.write(np.concatenate([render_tile(t) for t in band], axis=1))
+		else:
+			with (mp_context or multiprocessing).Pool(jobs, initializer=init_worker, initargs=({None: svg},)) as pool:
+				# render the next band while this one is compressed
+				pending = pool.map_async(render_tile, bands[0], chunksize=1)
+				for i in range(len(bands)):
+					tiles = pending.get()
+					if i + 1 < len(bands):
+						pending = pool.map_async(render_tile, bands[i+1], chunksize=1)
+					png.write(np.concatenate(tiles, axis=1))
+		png.close()
+
+####
+#### Tile pyramids for the web viewer
+####
+
+pyramid_tile = 256 # pixels on a side
+
+# render one tile of a pyramid into its file, or nothing if it is empty
+def write_pyramid_tile(job):
+	pixels = render_tile(job[0:6])
+	if not pixels[:,:,3].any():
+		return None
+	Image.fromarray(pixels, "RGBA").save(job[6], optimize=True)
+	return job
+
+# Render each of the svg documents into a pyramid of levels, each one
+# twice the size of the one before and the first one a single tile, in
+# directory/name/level/x_y.png.  Empty tiles are not written, the ones
+# that are and the faces (the names from the bottom up) are listed in
+# directory/tiles.json for the viewer.
+def save_pyramid(svgs, faces, directory, levels, jobs=None, tile=None, log=sys.stderr, mp_context=None):
+	if cairosvg is None:
+		raise RuntimeError("cairosvg is needed for the tiles")
+	tile = tile or pyramid_tile
+	(w, h) = svg_size(next(iter(svgs.values())))
+	todo = []
+	for name in svgs:
+		for level in range(levels):
+			scale = (tile << level) / max(w, h)
+			path = os.path.join(directory, name, str(level))
+			os.makedirs(path, exist_ok=True)
+			for band in tile_bands(math.ceil(w * scale), math.ceil(h * scale), tile):
+				for (x, y, tw, th) in band:
+					fname = os.path.join(path, "%d_%d.png" % (x // tile, y // tile))
+					todo.append((name, scale, x, y, tw, th, fname))
+
+	if jobs == 1:
+		init_worker(svgs)
+		done = list(map(write_pyramid_tile, todo))
+	else:
+		with (mp_context or multiprocessing).Pool(jobs, initializer=init_worker, initargs=(svgs,)) as pool:
+			done = pool.map(write_pyramid_tile, todo, chunksize=4)
+
+	rings = {name: [[] for level in range(levels)] for name in svgs}
+	for job in done:
+		if job is not None:
+			(name, scale, x, y) = job[0:4]
+			level = int(round(math.log2(scale * max(w, h) / tile)))
+			rings[name][level].append([x // tile, y // tile])
+	manifest = {
+		"tile": tile,
+		"levels": levels,
+		"width": w,
+		"height": h,
+		"faces": faces,
+		"rings": rings,
+	}
+	with open(os.path.join(directory, "tiles.json"), "w") as f:
+		json.dump(manifest, f)
+	if log:
+		print("%s: %d of %d tiles" % (directory, len(done) - done.count(None), len(todo)), file=log)
+	return manifest
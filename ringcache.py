@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# Content addressed cache of the serialized SVG for each ring.
+#
+# The key for a ring is a hash of the source of its make_* function,
+# every function that it calls, the module constants that any of them
+# reference (year, cut, ...), the helper modules in this directory that
+# they use (curves, svgopt, ...) and the arguments it was called with.
+# Changing one ring's radius or code only invalidates that ring,
+# everything else is read back from the previous run.
+#
+
+import os
+import dis
+import hashlib
+import inspect
+import types
+import tempfile
+
+# the directory is shared by all the generators in this repository
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "rings")
+cache_size = 64 << 20 # bytes, oldest used entries are evicted after this
+
+memory = {}
+sources = {}
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+# all the global names used by a function, including the ones in
+# any lambdas or nested functions inside of it.  co_names would also
+# have the attribute names, like the __name__ of func.__name__.
+def code_names(code):
+	names = set(i.argval for i in dis.get_instructions(code) if i.opname == "LOAD_GLOBAL")
+	for c in code.co_consts:
+		if isinstance(c, types.CodeType):
+			names |= code_names(c)
+	return names
+
+# the modules of this repository, as opposed to numpy or drawsvg
+def is_local(v):
+	f = getattr(v, "__file__", None)
+	return isinstance(v, types.ModuleType) and f is not None \
+		and os.path.dirname(os.path.abspath(f)) == here
+
+# a local module and the ones that it imports, since calls into them
+# like curves.polar_path() are attributes that the walk can't follow
+def local_modules(module, modules):
+	if module.__name__ in modules:
+		return
+	modules[module.__name__] = module
+	for v in list(vars(module).values()):
+		if is_local(v):
+			local_modules(v, modules)
+
+def source(func):
+	if func not in sources:
+		sources[func] = inspect.getsource(func)
+	return sources[func]
+
+# numpy arrays and scalars, without importing numpy here
+def is_array(v):
+	return hasattr(v, "dtype") and hasattr(v, "shape") and hasattr(v, "tobytes")
+
+def is_constant(v):
+	if isinstance(v, (bool, int, float, str, type(None))) or is_array(v):
+		return True
+	if isinstance(v, (list, tuple, set, frozenset)):
+		return all(is_constant(x) for x in v)
+	if isinstance(v, dict):
+		return all(is_constant(k) and is_constant(x) for (k, x) in v.items())
+	return False
+
+def value_repr(v):
+	if isinstance(v, types.FunctionType):
+		return source(v)
+	if is_array(v):
+		return "array(%s,%s,%s)" % (v.dtype, v.shape, hashlib.sha256(v.tobytes()).hexdigest())
+	if isinstance(v, (list, tuple)):
+		return "[" + ",".join(value_repr(x) for x in v) + "]"
+	if isinstance(v, (set, frozenset)):
+		return "{" + ",".join(sorted(value_repr(x) for x in v)) + "}"
+	if isinstance(v, dict):
+		return "{" + ",".join(sorted(value_repr(k) + ":" + value_repr(x) for (k, x) in v.items())) + "}"
+	return repr(v)
+
+# the globals that can be used without being part of the key, since
+# they are code that is either followed by the walk or in a library
+def is_code(v):
+	return isinstance(v, (types.FunctionType, types.BuiltinFunctionType, types.ModuleType, type))
+
+# walk the call graph from the given functions through the module
+# globals, except for the names in ignore that only hold the state of
+# the build in progress.  The globals that are neither code nor
+# constants, like objects, can't be hashed and are returned as opaque.
+def dependencies(funcs, ignore=()):
+	funcs = list(funcs)
+	seen = {}
+	constants = {}
+	modules = {}
+	opaque = set()
+	while funcs:
+		f = funcs.pop()
+		name = os.path.basename(f.__code__.co_filename) + ":" + f.__qualname__
+		if name in seen:
+			continue
+		seen[name] = f
+		for name in code_names(f.__code__):
+			if name not in f.__globals__ or name in ignore:
+				continue
+			v = f.__globals__[name]
+			if isinstance(v, types.FunctionType):
+				funcs.append(v)
+			elif is_local(v):
+				local_modules(v, modules)
+			elif is_constant(v):
+				constants[name] = v
+			elif not is_code(v):
+				opaque.add(name)
+	return (seen, constants, modules, opaque)
+
+# keys of the rings that read an opaque global, which are built every
+# time instead of being looked up since the key can't tell if it changed
+uncacheable = set()
+
+# the salt is for anything outside of the source that changes the
+# output, like the version of the svg library
+def source_key(func, args=(), kwargs={}, deps=(), salt="", ignore=()):
+	(funcs, constants, modules, opaque) = dependencies((func,) + tuple(deps), ignore)
+	h = hashlib.sha256()
+	h.update(salt.encode())
+	for name in sorted(funcs):
+		h.update(name.encode())
+		h.update(source(funcs[name]).encode())
+	for name in sorted(modules):
+		h.update(name.encode())
+		h.update(source(modules[name]).encode())
+	for name in sorted(constants):
+		h.update(("%s=%s\n" % (name, value_repr(constants[name]))).encode())
+	h.update(func.__name__.encode())
+	h.update(value_repr(list(args)).encode())
+	for name in sorted(kwargs):
+		h.update(("%s=%s\n" % (name, value_repr(kwargs[name]))).encode())
+	key = h.hexdigest()
+	if opaque:
+		uncacheable.add(key)
+	return key
+
+def path(key):
+	return os.path.join(cache_dir, key[0:2], key + ".svg")
+
+def lookup(key):
+	if key in uncacheable:
+		return None
+	if key in memory:
+		return memory[key]
+	if cache_dir is None:
+		return None
+	fname = path(key)
+	try:
+		with open(fname, encoding="utf-8") as f:
+			text = f.read()
+		# touch it so that the eviction knows it was recently used
+		os.utime(fname)
+	except OSError:
+		return None
+	memory[key] = text
+	return text
+
+# bytes in cache_dir as of the last scan and what was stored since, so
+# that it is only scanned again when it goes over cache_size
+used = None
+used_dir = None
+
+def store(key, text):
+	global used
+	if key in uncacheable:
+		return
+	memory[key] = text
+	if cache_dir is None:
+		return
+	fname = path(key)
+	os.makedirs(os.path.dirname(fname), exist_ok=True)
+
+	# write and rename so that parallel builds never see a partial entry
+	(fd, tmp) = tempfile.mkstemp(dir=os.path.dirname(fname), suffix=".tmp")
+	with os.fdopen(fd, "w", encoding="utf-8") as f:
+		f.write(text)
+	os.replace(tmp, fname)
+	if used is None or used_dir != cache_dir:
+		evict()
+		return
+	used += os.path.getsize(fname)
+	if used > cache_size:
+		evict()
+
+# remove the least recently used entries until the cache fits
+def evict(max_size=None):
+	global used, used_dir
+	if max_size is None:
+		max_size = cache_size
+	entries = []
+	total = 0
+	for (dirpath, dirnames, filenames) in os.walk(cache_dir):
+		for name in filenames:
+			fname = os.path.join(dirpath, name)
+			try:
+				st = os.stat(fname)
+			except OSError:
+				continue
+			entries.append((st.st_mtime, st.st_size, fname))
+			total += st.st_size
+
+	entries.sort()
+	for (mtime, size, fname) in entries:
+		if total <= max_size:
+			break
+		try:
+			os.remove(fname)
+		except OSError:
+			pass
+		total -= size
+	used = total
+	used_dir = cache_dir
@@ -3,6 +3,7 @@ var limb = 'upper';
 var inner;
 var outer;
 var pointer;
+var back_pointer = null;
 var sliderule;
 var speed = "2s";
 var computed = 0;
@@ -112,16 +113,21 @@ function rotate(elem, value, speed)
 {
 	elem.value = value;
 	elem.style.transform = "rotate(" + -value*6 + "deg)";
+	// the back face shows the same pointer, in the svg it is a <use> of it
+	if (elem === pointer && back_pointer)
+		back_pointer.style.transform = elem.style.transform;
 }
 
 function setup(){
 	var date = document.getElementById("date");
 	if (date.value == "")
 		date.valueAsDate = new Date();
-	sliderule = document.getElementById("sliderule").contentDocument;
+	sliderule = viewer ? document : document.getElementById("sliderule").contentDocument;
 	pointer = sliderule.getElementById("pointer");
 	inner = sliderule.getElementById("inner");
 	outer = sliderule.getElementById("outer");
+	if (viewer)
+		back_pointer = document.getElementById("back_pointer");
 
 	set("ho", "");
 	set("za", "");
@@ -135,7 +141,150 @@ function setup(){
 	step = 0;
 }
 
-window.onload = setup;
+// The rule is drawn either by the svg in the <object>, or by a stack of
+// an element for each ring that are rotated with css, which is much
+// faster on phones.  These are the png tiles from "make-rule.py --tiles
+// tiles", of which only the ones for the size that the rule is shown at
+// are loaded, or an svg for each ring from "make-rule.py --split split",
+// where the back face is only loaded after the front.
+var tiles_dir = "tiles/";
+var split_dir = "split/";
+var viewer = null;
+var tiles = null;
+
+function fetch_json(url)
+{
+	return fetch(url)
+		.then((response) => response.ok ? response.json() : null)
+		.catch(() => null);
+}
+
+function load_rule()
+{
+	return fetch_json(tiles_dir + "tiles.json").then((manifest) => {
+		if (manifest)
+			return show_tiles(manifest);
+		return fetch_json(split_dir + "rings.json").then((manifest) => {
+			if (manifest)
+				return show_split(manifest);
+			return load_svg();
+		});
+	});
+}
+
+function load_svg()
+{
+	return new Promise((resolve) => {
+		var obj = document.getElementById("sliderule");
+		obj.onload = resolve;
+		obj.data = obj.dataset.src;
+	});
+}
+
+// a div for each ring of each face, from the bottom up
+function make_viewer(manifest)
+{
+	viewer = manifest;
+	var elem = document.getElementById("sliderule-rings");
+
+	for (const face in viewer.faces)
+	{
+		var face_elem = document.createElement("div");
+		face_elem.className = "face";
+		for (const name of viewer.faces[face])
+		{
+			var ring = document.createElement("div");
+			ring.className = "ring";
+			ring.dataset.name = name;
+			ring.dataset.face = face;
+			// only the front and the pointer on the back rotate,
+			// rule.js finds them by id
+			if (face == "front")
+				ring.id = name;
+			else
+			if (name == "pointer")
+				ring.id = face + "_pointer";
+			face_elem.appendChild(ring);
+		}
+		elem.appendChild(face_elem);
+	}
+
+	document.getElementById("sliderule").hidden = true;
+	elem.hidden = false;
+}
+
+function show_split(manifest)
+{
+	make_viewer(manifest);
+
+	var front = [];
+	for (const ring of document.querySelectorAll('#sliderule-rings .ring[data-face="front"]'))
+		front.push(add_image(ring));
+
+	// the rule can be used as soon as the front is there
+	return Promise.all(front).then(() => {
+		for (const ring of document.querySelectorAll('#sliderule-rings .ring:not([data-face="front"])'))
+			add_image(ring);
+	});
+}
+
+function add_image(ring)
+{
+	var img = document.createElement("img");
+	img.src = split_dir + viewer.rings[ring.dataset.name].file;
+	img.style.left = "0";
+	img.style.top = "0";
+	img.style.width = "100%";
+	img.style.height = "100%";
+	ring.appendChild(img);
+	return img.decode().catch(() => null);
+}
+
+function show_tiles(manifest)
+{
+	make_viewer(manifest);
+	tiles = manifest;
+	tiles.level = -1;
+	show_level(tile_level());
+	window.addEventListener("resize", () => show_level(tile_level()));
+}
+
+// the smallest level that has at least one pixel per screen pixel
+function tile_level()
+{
+	var face = document.querySelector("#sliderule-rings .face");
+	var pixels = face.getBoundingClientRect().width * (window.devicePixelRatio || 1);
+	var level = 0;
+	while (level < tiles.levels - 1 && (tiles.tile << level) < pixels)
+		level++;
+	return level;
+}
+
+function show_level(level)
+{
+	if (level == tiles.level)
+		return;
+	tiles.level = level;
+
+	// as a percentage of the ring
+	var size = 100 * tiles.tile / (tiles.tile << level);
+
+	for (const ring of document.querySelectorAll("#sliderule-rings .ring"))
+	{
+		var name = ring.dataset.name;
+		ring.replaceChildren(...tiles.rings[name][level].map(([x,y]) => {
+			var img = document.createElement("img");
+			img.src = tiles_dir + name + "/" + level + "/" + x + "_" + y + ".png";
+			img.style.left = x * size + "%";
+			img.style.top = y * size + "%";
+			img.style.width = size + "%";
+			img.style.height = size + "%";
+			return img;
+		}));
+	}
+}
+
+window.onload = () => load_rule().then(setup);
 
 function reset_pointer(all=0)
 {
@@ -148,24 +297,22 @@ function reset_pointer(all=0)
 
 }
 
+// works the same with the svg and the rings of the viewer, with the
+// elements that setup() found in the sliderule that load_rule() loaded
 function set_rule(p,i,o) {
-	sliderule = document.getElementById("sliderule").contentDocument;
-
 	// find the shortest way to rotate the inner one
 	// the outer and pointer must take the long way around
-	if (i - inner > 30)
+	if (i - inner.value > 30)
 		i = i - 60;
 	else
-	if (i - inner < -30)
+	if (i - inner.value < -30)
 		i = i + 60;
 
-	inner = i;
-	outer = o;
-	pointer = p;
-	sliderule.getElementById("pointer").style.transitionDuration = speed;
-	sliderule.getElementById("inner").style.transitionDuration = speed;
-	sliderule.getElementById("outer").setAttribute("transform","rotate(" + -outer*6 + ")");
-	sliderule.getElementById("pointer").setAttribute("transform","rotate(" + pointer*6 + ")");
+	pointer.style.transitionDuration = speed;
+	inner.style.transitionDuration = speed;
+	rotate(inner, i, speed);
+	rotate(outer, o, speed);
+	rotate(pointer, p, speed);
 }
 
 function move_rule(which, value, rel=0)
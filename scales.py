@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# Tick marks for any scale from its mapping function.
+#
+# The scales on the rule map a value to an angle with a nonlinear
+# function, so the ticks are far apart in some places and crowded in
+# others.  Instead of hand picking the steps for each range, the value
+# range is cut into intervals of a power of ten, and each interval is
+# split as finely as it can be while the ticks stay at least a minimum
+# distance apart on the ring, and then split again the same way.  The
+# steps are always 1, 2 or 5 times a power of ten, so an interval of 1
+# is split into 10, 5 or 2, one of 2 into 10, 4 or 2 and one of 5 into
+# 10 or 5.  Each interval is split on its own, so the ticks get finer
+# where the scale is stretched out, and all of the intervals of a level
+# are checked at once with numpy.
+#
+# The levels where the ticks are far enough apart for labels are the
+# major ticks, and the ones after that are the minor ticks, each one
+# shorter than the one before.
+#
+
+import numpy as np
+from math import floor, ceil, log10
+
+# ways to split an interval by the first digit of its width, finest
+# first, that keep the steps at 1, 2 or 5 times a power of ten
+divisions = {
+	1: (10, 5, 2),
+	2: (10, 4, 2),
+	5: (10, 5),
+}
+
+# the first digit of each width
+def first_digit(widths):
+	return np.rint(widths / 10.0 ** np.floor(np.log10(widths) + 1e-9)).astype(int)
+
+# make a function of one value work on arrays
+def vectorize(f):
+	def g(x):
+		try:
+			return np.asarray(f(x), dtype=float)
+		except TypeError:
+			return np.vectorize(f, otypes=[float])(x)
+	return g
+
+# The intervals of a power of ten that cover lo to hi, as arrays of
+# their starts and widths
+def root_intervals(lo, hi):
+	step = 10.0 ** floor(log10(hi - lo))
+	starts = np.arange(floor(lo / step), ceil(hi / step)) * step
+	return (starts, np.full(starts.shape, step))
+
+# Split each of the intervals as finely as the spacing allows, returns
+# the new ticks and all of the intervals after the split.  Ticks outside
+# of lo to hi don't count, since they won't be drawn.
+def subdivide(f, lo, hi, starts, widths, radius, spacing):
+	eps = 1e-9 * (hi - lo)
+	n = np.ones(len(starts), dtype=int)
+	digits = first_digit(widths)
+	for d in sorted(set(sum(divisions.values(), ())), reverse=True):
+		todo = (n == 1) & np.isin(digits, [x for x in divisions if d in divisions[x]])
+		if not todo.any():
+			continue
+		values = starts[todo,None] + widths[todo,None] * np.arange(d+1) / d
+		inside = (values >= lo - eps) & (values <= hi + eps)
+		angles = f(np.clip(values, lo, hi))
+		gaps = radius * np.radians(np.abs(np.diff(angles, axis=1)))
+		gaps[~(inside[:,:-1] & inside[:,1:])] = np.inf
+		ok = np.nan_to_num(gaps, nan=0).min(axis=1) >= spacing
+		n[np.flatnonzero(todo)[ok]] = d
+
+	widths = np.repeat(widths / n, n)
+	# the position of each new interval within the one that it came from
+	k = np.arange(len(widths)) - np.repeat(np.cumsum(n) - n, n)
+	starts = np.repeat(starts, n) + k * widths
+	# every new interval except the first in each one starts with a new tick
+	ticks = starts[k > 0]
+	# and the ones that are entirely outside of lo to hi are never split
+	eps = 1e-9 * (hi - lo)
+	keep = (starts + widths >= lo - eps) & (starts <= hi + eps)
+	return (ticks, starts[keep], widths[keep])
+
+def in_range(ticks, lo, hi):
+	eps = 1e-9 * (hi - lo)
+	ticks = np.round(ticks, 9)
+	return np.unique(ticks[(ticks >= lo - eps) & (ticks <= hi + eps)])
+
+# The ticks of the scale f from lo to hi on a ring of radius, where f
+# maps the values to the angle in degrees.  The major ticks are at
+# least label_spacing apart and each of the levels of minor ticks at
+# least spacing.  lo and hi are always majors, so that the ends of the
+# scale are labeled.  Returns the majors and a list of the levels of
+# minors that have any ticks, from the longest to the shortest.
+def tick_hierarchy(f, lo, hi, radius, spacing, label_spacing, levels=3):
+	f = vectorize(f)
+	(starts, widths) = root_intervals(lo, hi)
+	majors = [starts, starts[-1:] + widths[-1:]]
+	while True:
+		(ticks, starts, widths) = subdivide(f, lo, hi, starts, widths, radius, label_spacing)
+		if len(ticks) == 0:
+			break
+		majors.append(ticks)
+	majors = in_range(np.concatenate(majors + [[lo, hi]]), lo, hi)
+
+	minors = []
+	for level in range(levels):
+		(ticks, starts, widths) = subdivide(f, lo, hi, starts, widths, radius, spacing)
+		ticks = in_range(ticks, lo, hi)
+		if len(ticks) == 0:
+			break
+		minors.append(ticks[~np.isin(ticks, majors)])
+
+	return (majors, minors)
+
+# the fewest decimal places that show all of the ticks
+def decimals(ticks, most=6):
+	for places in range(most):
+		if np.allclose(ticks, np.round(ticks, places), rtol=0, atol=1e-9):
+			return places
+	return most
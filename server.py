@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# A small asyncio http server for rendering on request.
+#
+# The renders run in a pool of worker processes, which can keep what
+# they have built (like the rings) in memory between requests.  The most
+# recent results are kept in a least recently used cache, and a request
+# that is the same as one that is still being rendered waits for that
+# one instead of starting another.
+#
+# Only GET is supported, with the parameters in the query string.
+#
+
+import sys
+import json
+import asyncio
+import urllib.parse
+import concurrent.futures
+from collections import OrderedDict
+
+class HTTPError(Exception):
+	def __init__(self, status, message):
+		super().__init__(message)
+		self.status = status
+
+reasons = {
+	200: "OK",
+	400: "Bad Request",
+	404: "Not Found",
+	405: "Method Not Allowed",
+	500: "Internal Server Error",
+	501: "Not Implemented",
+}
+
+# least recently used cache, limited by the total size of the values
+class LRUCache:
+	def __init__(self, max_bytes):
+		self.max_bytes = max_bytes
+		self.bytes = 0
+		self.items = OrderedDict()
+
+	def get(self, key):
+		value = self.items.get(key)
+		if value is not None:
+			self.items.move_to_end(key)
+		return value
+
+	def put(self, key, value):
+		if len(value) > self.max_bytes:
+			return
+		if key in self.items:
+			self.bytes -= len(self.items.pop(key))
+		self.items[key] = value
+		self.bytes += len(value)
+		while self.bytes > self.max_bytes:
+			(old, old_value) = self.items.popitem(last=False)
+			self.bytes -= len(old_value)
+
+# Calls render(job) in a pool of processes for each job that isn't in
+# the cache, the jobs have to be hashable and the results bytes.  The
+# initializer is called with initargs in each worker to give it the
+# state that render() needs, unless the context forks them.
+class RenderService:
+	def __init__(self, render, jobs=None, cache_bytes=64 << 20, initializer=None, initargs=(), mp_context=None):
+		self.render = render
+		self.pool = concurrent.futures.ProcessPoolExecutor(jobs, mp_context=mp_context, initializer=initializer, initargs=initargs)
+		self.cache = LRUCache(cache_bytes)
+		self.pending = {}
+		self.stats = {"renders": 0, "hits": 0, "coalesced": 0}
+
+	async def get(self, job):
+		value = self.cache.get(job)
+		if value is not None:
+			self.stats["hits"] += 1
+			return value
+
+		future = self.pending.get(job)
+		if future is not None:
+			self.stats["coalesced"] += 1
+		else:
+			self.stats["renders"] += 1
+			future = asyncio.get_running_loop().run_in_executor(self.pool, self.render, job)
+			self.pending[job] = future
+			future.add_done_callback(lambda f: self.finish(job, f))
+		# a client that goes away doesn't cancel it for the others
+		return await asyncio.shield(future)
+
+	def finish(self, job, future):
+		del self.pending[job]
+		if not future.cancelled() and future.exception() is None:
+			self.cache.put(job, future.result())
+
+	def status(self):
+		return dict(self.stats, cached=len(self.cache.items), cache_bytes=self.cache.bytes, rendering=len(self.pending))
+
+	def close(self):
+		self.pool.shutdown(cancel_futures=True)
+
+def json_response(value):
+	return ("application/json", json.dumps(value, indent=1).encode("utf-8"))
+
+async def read_request(reader):
+	line = await reader.readline()
+	if not line:
+		return None
+	parts = line.decode("latin-1").split()
+	if len(parts) != 3:
+		raise HTTPError(400, "bad request line")
+	headers = {}
+	while True:
+		line = await reader.readline()
+		if line in (b"\r\n", b"\n", b""):
+			break
+		(name, _, value) = line.decode("latin-1").partition(":")
+		headers[name.strip().lower()] = value.strip()
+	return (parts[0], parts[1], parts[2], headers)
+
+def write_response(writer, status, content_type, body, keep_alive):
+	head = [
+		"HTTP/1.1 %d %s" % (status, reasons.get(status, "")),
+		"Content-Type: %s" % (content_type),
+		"Content-Length: %d" % (len(body)),
+		"Access-Control-Allow-Origin: *",
+		"Connection: %s" % ("keep-alive" if keep_alive else "close"),
+	]
+	writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+	writer.write(body)
+
+# a body that is an async iterator, like server-sent events, is written
+# as it comes and the connection is closed at the end of it
+async def write_stream(writer, content_type, body):
+	head = [
+		"HTTP/1.1 200 OK",
+		"Content-Type: %s" % (content_type),
+		"Cache-Control: no-cache",
+		"Access-Control-Allow-Origin: *",
+		"Connection: close",
+	]
+	writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+	async for chunk in body:
+		writer.write(chunk)
+		await writer.drain()
+
+# routes maps each path to an async function of the query parameters
+# that returns the content type and the body, bytes or an async iterator
+async def handle(routes, reader, writer, log):
+	try:
+		while True:
+			request = None
+			target = "-"
+			try:
+				request = await read_request(reader)
+				if request is None:
+					break
+				(method, target, version, headers) = request
+				keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+				url = urllib.parse.urlsplit(target)
+				query = dict(urllib.parse.parse_qsl(url.query))
+				if method not in ("GET", "HEAD"):
+					raise HTTPError(405, "only GET is supported")
+				if url.path not in routes:
+					raise HTTPError(404, "no such path " + url.path)
+				(content_type, body) = await routes[url.path](query)
+				status = 200
+				if not isinstance(body, bytes):
+					if log:
+						print("%d %s stream" % (status, target), file=log)
+					await write_stream(writer, content_type, body)
+					break
+			except HTTPError as e:
+				(status, content_type, body) = (e.status, "text/plain", str(e).encode("utf-8"))
+				keep_alive = False
+			except ValueError as e:
+				(status, content_type, body) = (400, "text/plain", str(e).encode("utf-8"))
+				keep_alive = False
+			except Exception as e:
+				(status, content_type, body) = (500, "text/plain", repr(e).encode("utf-8"))
+				keep_alive = False
+
+			if log:
+				print("%d %s %d" % (status, target, len(body)), file=log)
+			head = request is not None and request[0] == "HEAD"
+			write_response(writer, status, content_type, b"" if head else body, keep_alive)
+			await writer.drain()
+			if not keep_alive:
+				break
+	except (ConnectionError, asyncio.IncompleteReadError):
+		pass
+	finally:
+		writer.close()
+
+# tasks are coroutine functions that run alongside the server
+async def serve_forever(routes, host, port, log, tasks=()):
+	server = await asyncio.start_server(lambda r, w: handle(routes, r, w, log), host, port)
+	if log:
+		print("listening on http://%s:%d/ for %s" % (host, port, " ".join(sorted(routes))), file=log)
+	# keep a reference to them so that they aren't collected
+	running = [asyncio.create_task(task()) for task in tasks]
+	async with server:
+		await server.serve_forever()
+
+def serve(routes, host="127.0.0.1", port=8000, log=sys.stderr, tasks=()):
+	try:
+		asyncio.run(serve_forever(routes, host, port, log, tasks))
+	except KeyboardInterrupt:
+		pass
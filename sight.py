@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# The corrections of a sextant sight of the sun or a star.
+#
+# These are the same steps and approximations as the worked example in
+# rule.js, done directly instead of with the rule: the index error, the
+# dip for the height of eye, refraction and the semi-diameter of the sun
+# give the observed height, then the zenith angle and the declination
+# from its approximation give the latitude at noon.  All of the angles
+# are in degrees except for the corrections, which are in minutes.
+#
+
+import datetime
+from math import sqrt, tan, sin, cos, asin, radians, degrees
+
+# semi-diameter of the sun on the first of each month, and the next January
+semi_diameters = [
+	16.29, 16.26, 16.17, 16.03, 15.90, 15.80,
+	15.75, 15.78, 15.87, 16.00, 16.14, 16.24,
+	16.29,
+]
+
+def dip(height_of_eye):
+	return 1.76 * sqrt(height_of_eye)
+
+def refraction(apparent_height, pressure=1010, temperature=10):
+	r = 1 / tan(radians(apparent_height + 7.31 / (apparent_height + 4.4)))
+	return r * pressure / (273 + temperature) * 283 / 1010
+
+def semi_diameter(date):
+	a = semi_diameters[date.month - 1]
+	b = semi_diameters[date.month]
+	return a + (b - a) * (date.day - 1) / 31
+
+# approximate declination of the sun, d is the days since the start of the year
+def declination(d):
+	return -degrees(asin(0.39779 * cos(radians(0.98565 * (d+10) + 1.914 * sin(radians(0.98565 * (d-2)))))))
+
+def day_of_year(when):
+	start = datetime.datetime(when.year, 1, 1, tzinfo=when.tzinfo)
+	return (when - start).total_seconds() / 86400
+
+# Correct a sextant reading hs taken at when (a datetime in UT), returns
+# a dict of each of the steps.  limb is "upper", "lower" or "star", and
+# north is True if the observer is north of the sun.
+def correct(hs, when, index_error=0, height_of_eye=0, temperature=10, pressure=1010, limb="lower", north=True):
+	if limb not in ("upper", "lower", "star"):
+		raise ValueError("limb must be upper, lower or star")
+	ha = hs - (index_error + dip(height_of_eye)) / 60
+	r = refraction(ha, pressure, temperature)
+	sd = 0 if limb == "star" else semi_diameter(when)
+	ho = ha - r / 60 + (sd if limb == "lower" else -sd) / 60
+	za = 90 - ho if north else ho - 90
+	decl = declination(day_of_year(when))
+	return {
+		"hs": hs,
+		"index_error": index_error,
+		"dip": dip(height_of_eye),
+		"ha": ha,
+		"refraction": r,
+		"semi_diameter": sd,
+		"ho": ho,
+		"za": za,
+		"declination": decl,
+		"latitude": decl + za,
+	}
@@ -0,0 +1,647 @@
+#!/usr/bin/env python3
+# Optimizer for the generated SVG.
+#
+# Folds the nested "rotate() translate() rotate()" transforms into the
+# coordinates of paths and circles, or into a single matrix for text,
+# rounds the coordinates to what is visible at the print resolution
+# and drops attributes that have no effect.  Anything with an id or
+# class keeps its transform since rule.js rotates those groups.
+#
+# It can also find geometry that is repeated between the rings and
+# store it once as a <symbol>.
+#
+
+from math import sin, cos, tan, radians, degrees, atan2, sqrt, ceil, log10
+import re
+import hashlib
+import xml.etree.ElementTree as ET
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+
+identity = (1, 0, 0, 1, 0, 0)
+
+# svg user units are css pixels, 96 per inch.  Keep enough digits
+# so that the rounding error is a quarter of a printed dot.
+def digits_for_dpi(dpi):
+	return max(0, ceil(log10(4 * dpi / 96)))
+
+# compact number formatting, "0.5" becomes ".5" and "-0.5" "-.5"
+def fmt_num(x, digits=2):
+	s = "%.*f" % (digits, x)
+	if "." in s:
+		s = s.rstrip("0").rstrip(".")
+	if s == "-0" or s == "":
+		return "0"
+	if s.startswith("0."):
+		s = s[1:]
+	elif s.startswith("-0."):
+		s = "-" + s[2:]
+	return s
+
+####
+#### Affine matrices, as (a b c d e f) like the svg matrix() transform
+####
+
+def mat_mul(m, n):
+	(a1,b1,c1,d1,e1,f1) = m
+	(a2,b2,c2,d2,e2,f2) = n
+	return (
+		a1*a2 + c1*b2,
+		b1*a2 + d1*b2,
+		a1*c2 + c1*d2,
+		b1*c2 + d1*d2,
+		a1*e2 + c1*f2 + e1,
+		b1*e2 + d1*f2 + f1,
+	)
+
+def mat_apply(m, x, y):
+	(a,b,c,d,e,f) = m
+	return (a*x + c*y + e, b*x + d*y + f)
+
+def mat_rotate(angle, cx=0, cy=0):
+	c = cos(radians(angle))
+	s = sin(radians(angle))
+	m = (c, s, -s, c, 0, 0)
+	if cx or cy:
+		m = mat_mul(mat_mul((1,0,0,1,cx,cy), m), (1,0,0,1,-cx,-cy))
+	return m
+
+def parse_transform(s):
+	m = identity
+	if not s:
+		return m
+	for (name,args) in re.findall(r"(\w+)\s*\(([^)]*)\)", s):
+		v = [float(x) for x in re.split(r"[\s,]+", args.strip()) if x]
+		if name == "matrix":
+			t = tuple(v)
+		elif name == "translate":
+			t = (1, 0, 0, 1, v[0], v[1] if len(v) > 1 else 0)
+		elif name == "scale":
+			t = (v[0], 0, 0, v[1] if len(v) > 1 else v[0], 0, 0)
+		elif name == "rotate":
+			t = mat_rotate(*v)
+		elif name == "skewX":
+			t = (1, 0, tan(radians(v[0])), 1, 0, 0)
+		elif name == "skewY":
+			t = (1, tan(radians(v[0])), 0, 1, 0, 0)
+		else:
+			raise ValueError("unknown transform " + name)
+		m = mat_mul(m, t)
+	return m
+
+def is_identity(m, eps=1e-9):
+	return all(abs(x-y) < eps for (x,y) in zip(m, identity))
+
+# rotation and uniform scale, possibly mirrored; these keep circles circular
+def is_similarity(m, eps=1e-6):
+	(a,b,c,d,e,f) = m
+	return abs(a*a + b*b - c*c - d*d) < eps and abs(a*c + b*d) < eps
+
+def mat_scale(m):
+	(a,b,c,d,e,f) = m
+	return sqrt(abs(a*d - b*c))
+
+# rotation and translation, possibly mirrored, which can be folded into
+# the coordinates without changing the width of the strokes
+def is_rigid(m, eps=1e-6):
+	return is_similarity(m, eps) and abs(mat_scale(m) - 1) < eps
+
+def fmt_matrix(m, digits):
+	(a,b,c,d,e,f) = m
+	if abs(a-1) < 1e-9 and abs(d-1) < 1e-9 and abs(b) < 1e-9 and abs(c) < 1e-9:
+		return "translate(%s %s)" % (fmt_num(e, digits), fmt_num(f, digits))
+	# the linear part is multiplied by the size of the element,
+	# so it needs more digits than the offsets
+	return "matrix(%s)" % (" ".join(
+		[fmt_num(x, digits+3) for x in (a,b,c,d)] +
+		[fmt_num(x, digits) for x in (e,f)]))
+
+####
+#### Path data
+####
+
+path_args = {"M":2, "L":2, "H":1, "V":1, "C":6, "S":4, "Q":4, "T":2, "A":7, "Z":0}
+number_re = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+# parse path data into a list of absolute commands with their numbers
+def parse_path(d):
+	cmds = []
+	i = 0
+	n = len(d)
+	cmd = None
+	(x, y) = (0, 0)
+	(sx, sy) = (0, 0)
+	while True:
+		while i < n and d[i] in " \t\r\n,":
+			i += 1
+		if i >= n:
+			break
+		if d[i].isalpha():
+			cmd = d[i]
+			i += 1
+			if cmd in "Zz":
+				cmds.append(("Z", []))
+				(x, y) = (sx, sy)
+				continue
+		elif cmd is None:
+			raise ValueError("path data must start with a command")
+
+		up = cmd.upper()
+		v = []
+		for k in range(path_args[up]):
+			while i < n and d[i] in " \t\r\n,":
+				i += 1
+			if up == "A" and k in (3, 4):
+				# arc flags are a single digit and can be run together
+				v.append(float(d[i]))
+				i += 1
+				continue
+			m = number_re.match(d, i)
+			if m is None:
+				raise ValueError("bad path data at %d" % (i))
+			v.append(float(m.group(0)))
+			i = m.end()
+
+		rel = cmd != up
+		if up == "H":
+			v = [v[0] + (x if rel else 0), y]
+			up = "L"
+		elif up == "V":
+			v = [x, v[0] + (y if rel else 0)]
+			up = "L"
+		elif up == "A":
+			if rel:
+				v[5] += x
+				v[6] += y
+		elif rel:
+			for k in range(0, len(v), 2):
+				v[k] += x
+				v[k+1] += y
+
+		cmds.append((up, v))
+		(x, y) = (v[-2], v[-1])
+		if up == "M":
+			(sx, sy) = (x, y)
+			# extra coordinates after a moveto are linetos
+			cmd = "l" if rel else "L"
+	return cmds
+
+def transform_path(cmds, m):
+	out = []
+	flip = (m[0]*m[3] - m[1]*m[2]) < 0
+	rot = degrees(atan2(m[1], m[0]))
+	scale = mat_scale(m)
+	for (cmd,v) in cmds:
+		if cmd == "A":
+			(rx, ry, phi, large, sweep, x, y) = v
+			(x, y) = mat_apply(m, x, y)
+			if flip:
+				sweep = 1 - sweep
+				phi = -phi
+			out.append((cmd, [rx*scale, ry*scale, phi+rot, large, sweep, x, y]))
+			continue
+		w = []
+		for k in range(0, len(v), 2):
+			w.extend(mat_apply(m, v[k], v[k+1]))
+		out.append((cmd, w))
+	return out
+
+def fmt_path(cmds, digits):
+	out = []
+	last = None
+	for (cmd,v) in cmds:
+		if cmd == "A":
+			nums = [fmt_num(v[0], digits), fmt_num(v[1], digits), fmt_num(v[2], 1),
+				"%d" % v[3], "%d" % v[4], fmt_num(v[5], digits), fmt_num(v[6], digits)]
+		else:
+			nums = [fmt_num(x, digits) for x in v]
+
+		# repeated commands can leave out the letter, except for
+		# a moveto which would turn into lineto
+		if cmd != last or cmd == "M" or cmd == "Z":
+			out.append(cmd)
+			sep = False
+		else:
+			sep = True
+		for s in nums:
+			if sep and not s.startswith("-") and not (s.startswith(".") and "." in prev):
+				out.append(" ")
+			out.append(s)
+			prev = s
+			sep = True
+		last = cmd
+	return "".join(out)
+
+####
+#### Tree rewriting
+####
+
+# initial values of the inherited properties that we drop when unchanged
+defaults = {
+	"fill": "black",
+	"stroke": "none",
+	"stroke-width": "1",
+	"font-style": "normal",
+	"text-anchor": "start",
+	"opacity": "1",
+	"fill-opacity": "1",
+	"stroke-opacity": "1",
+}
+
+# drawsvg passes through python keywords that are not svg attributes
+bogus = ["align"]
+
+coordinates = ["x", "y", "cx", "cy", "r", "rx", "ry", "width", "height", "x1", "y1", "x2", "y2"]
+
+def local_name(tag):
+	return tag.split("}")[-1]
+
+def strip_namespaces(elem):
+	for e in elem.iter():
+		e.tag = local_name(e.tag)
+		for k in list(e.attrib):
+			if k.startswith("{" + XLINK_NS + "}"):
+				e.attrib["xlink:" + local_name(k)] = e.attrib.pop(k)
+			elif k.startswith("{" + XML_NS + "}"):
+				e.attrib["xml:" + local_name(k)] = e.attrib.pop(k)
+			elif k.startswith("{"):
+				e.attrib[local_name(k)] = e.attrib.pop(k)
+
+def pinned(elem):
+	return "id" in elem.attrib or "class" in elem.attrib
+
+def has_pinned(elem):
+	return any(pinned(e) for e in elem.iter())
+
+def set_num(elem, name, value, digits):
+	s = fmt_num(value, digits)
+	if s == "0" and name in ("x", "y", "cx", "cy"):
+		elem.attrib.pop(name, None)
+	else:
+		elem.set(name, s)
+
+def set_transform(elem, m, digits):
+	if is_identity(m):
+		elem.attrib.pop("transform", None)
+	else:
+		elem.set("transform", fmt_matrix(m, digits))
+
+# digits for the coordinates of an element that keeps the matrix m,
+# which scales their rounding error as well
+def local_digits(m, digits):
+	scale = mat_scale(m)
+	if scale <= 1 + 1e-6:
+		return digits
+	return digits + ceil(log10(scale))
+
+def round_coordinates(elem, names, digits):
+	for name in names:
+		if name in elem.attrib:
+			try:
+				set_num(elem, name, float(elem.get(name)), digits)
+			except ValueError:
+				pass
+
+def fold_leaf(elem, tag, m, digits):
+	local = local_digits(m, digits)
+	if tag == "path" and "d" in elem.attrib:
+		cmds = parse_path(elem.get("d"))
+		if is_rigid(m):
+			cmds = transform_path(cmds, m)
+			elem.attrib.pop("transform", None)
+		else:
+			set_transform(elem, m, digits)
+		elem.set("d", fmt_path(cmds, local))
+		return
+
+	if tag == "circle" and is_rigid(m):
+		(cx, cy) = mat_apply(m, float(elem.get("cx", 0)), float(elem.get("cy", 0)))
+		set_num(elem, "cx", cx, digits)
+		set_num(elem, "cy", cy, digits)
+		set_num(elem, "r", float(elem.get("r", 0)), digits)
+		elem.attrib.pop("transform", None)
+		return
+
+	if tag == "text" and not any("x" in t.attrib or "y" in t.attrib for t in elem):
+		# move the position into the matrix so the common case of a
+		# rotated label has only one attribute for its placement
+		m = mat_mul(m, (1, 0, 0, 1, float(elem.get("x", 0)), float(elem.get("y", 0))))
+		elem.attrib.pop("x", None)
+		elem.attrib.pop("y", None)
+		set_transform(elem, m, digits)
+		return
+
+	if tag == "text":
+		for t in elem.iter("tspan"):
+			round_coordinates(t, ("x", "y", "dx", "dy"), local)
+	round_coordinates(elem, coordinates, local)
+	set_transform(elem, m, digits)
+
+def clean_attributes(elem, inherited):
+	for name in bogus:
+		elem.attrib.pop(name, None)
+	for (name,value) in list(elem.attrib.items()):
+		if name in defaults and inherited.get(name, defaults[name]) == value:
+			del elem.attrib[name]
+
+	inherited = dict(inherited)
+	for name in defaults:
+		if name in elem.attrib:
+			inherited[name] = elem.attrib[name]
+	return inherited
+
+def optimize_elem(elem, m, digits, inherited):
+	tag = elem.tag
+	t = parse_transform(elem.get("transform"))
+	m = mat_mul(m, t)
+	inherited = clean_attributes(elem, inherited)
+
+	if tag in ("g", "svg", "symbol", "defs", "a"):
+		if tag == "g" and not has_pinned(elem) and is_rigid(m):
+			# push the transform down into the children, a scaled
+			# one stays on the group instead of on each of them
+			elem.attrib.pop("transform", None)
+			child_m = m
+			child_digits = digits
+		else:
+			# rule.js replaces the transforms of the pinned groups,
+			# so leave them exactly as they were
+			if tag == "g" and not pinned(elem):
+				set_transform(elem, m, digits)
+			child_m = identity
+			child_digits = local_digits(m, digits)
+		for child in elem:
+			optimize_elem(child, child_m, child_digits, inherited)
+		unwrap_groups(elem)
+		return
+
+	if tag in ("style", "script", "title", "desc", "tspan"):
+		return
+
+	fold_leaf(elem, tag, m, digits)
+
+# groups without any attributes are just noise, move their children up
+def unwrap_groups(parent):
+	children = list(parent)
+	if not any(c.tag == "g" and not c.attrib for c in children):
+		return
+	for c in children:
+		parent.remove(c)
+	for c in children:
+		if c.tag == "g" and not c.attrib:
+			parent.extend(list(c))
+		else:
+			parent.append(c)
+
+# one element per line, but leave the text contents alone
+def tidy(elem):
+	if elem.tag in ("text", "style", "script", "title", "desc"):
+		return
+	if elem.text is not None and elem.text.strip() == "":
+		elem.text = None
+	for child in elem:
+		child.tail = "\n"
+		tidy(child)
+
+# optimize a fragment of svg elements, like the ones from make_fragment()
+def optimize_fragment(fragment, digits=2):
+	root = ET.fromstring('<g xmlns="%s" xmlns:xlink="%s">%s</g>' % (SVG_NS, XLINK_NS, fragment))
+	strip_namespaces(root)
+	for child in root:
+		optimize_elem(child, identity, digits, {})
+	unwrap_groups(root)
+	tidy(root)
+	return "".join(ET.tostring(child, encoding="unicode") for child in root).rstrip("\n")
+
+####
+#### Shared geometry
+####
+
+# hash of an element and everything inside of it, ignoring its own
+# transform since that can be moved onto the <use> that replaces it
+def subtree_hashes(elem, hashes, sizes):
+	h = hashlib.sha1(elem.tag.encode())
+	size = len(elem.tag) + len(elem.text or "")
+	for (k,v) in sorted(elem.attrib.items()):
+		size += len(k) + len(v) + 4
+		if k != "transform":
+			h.update(("%s=%s;" % (k, v)).encode())
+	h.update((elem.text or "").encode())
+	for child in elem:
+		subtree_hashes(child, hashes, sizes)
+		h.update(hashes[child].encode())
+		h.update(child.get("transform", "").encode())
+		size += sizes[child]
+	hashes[elem] = h.hexdigest()
+	sizes[elem] = size
+
+def find_instances(elem, hashes, sizes, counts, skip, min_size, instances):
+	h = hashes[elem]
+	if counts[h] > 1 and h not in skip and sizes[elem] >= min_size and not has_pinned(elem):
+		instances.setdefault(h, []).append(elem)
+		return
+	for child in elem:
+		find_instances(child, hashes, sizes, counts, skip, min_size, instances)
+
+# Find subtrees that are repeated in any of the fragments, like the
+# tick marks of the minute rings on both faces, and replace them with
+# <use> references to a single <symbol>.  Returns the <defs> contents
+# and the rewritten fragments.
+def share_symbols(fragments, min_size=100, prefix="sym"):
+	roots = {}
+	for (name,fragment) in fragments.items():
+		root = ET.fromstring('<g xmlns="%s" xmlns:xlink="%s">%s</g>' % (SVG_NS, XLINK_NS, fragment))
+		strip_namespaces(root)
+		roots[name] = root
+
+	hashes = {}
+	sizes = {}
+	counts = {}
+	for root in roots.values():
+		for child in root:
+			subtree_hashes(child, hashes, sizes)
+		for e in root.iter():
+			if e is not root:
+				counts[hashes[e]] = counts.get(hashes[e], 0) + 1
+
+	# a subtree that only repeats inside of a larger repeated subtree
+	# ends up with a single instance, so try again without it
+	skip = set()
+	while True:
+		instances = {}
+		for root in roots.values():
+			for child in root:
+				find_instances(child, hashes, sizes, counts, skip, min_size, instances)
+		single = set(h for (h,elems) in instances.items() if len(elems) < 2)
+		if not single:
+			break
+		skip |= single
+
+	parents = {}
+	for root in roots.values():
+		for e in root.iter():
+			for child in e:
+				parents[child] = e
+
+	defs = []
+	for (n,(h,elems)) in enumerate(sorted(instances.items(), key=lambda x: x[0])):
+		sym_id = "%s%d" % (prefix, n)
+		symbol = ET.Element("symbol", {"id": sym_id, "overflow": "visible"})
+		shape = elems[0]
+		for elem in elems:
+			use = ET.Element("use", {"xlink:href": "#" + sym_id})
+			if "transform" in elem.attrib:
+				use.set("transform", elem.get("transform"))
+			parent = parents[elem]
+			index = list(parent).index(elem)
+			parent.remove(elem)
+			parent.insert(index, use)
+		shape.attrib.pop("transform", None)
+		symbol.append(shape)
+		tidy(symbol)
+		defs.append(ET.tostring(symbol, encoding="unicode").rstrip("\n"))
+
+	out = {}
+	for (name,root) in roots.items():
+		tidy(root)
+		out[name] = "".join(ET.tostring(child, encoding="unicode") for child in root).rstrip("\n")
+	return ("\n".join(defs), out)
+
+ref_re = re.compile(r'href="#([^"]+)"|url\(#([^)]+)\)')
+
+# The elements of defs that a fragment refers to, directly or through
+# the other ones, so that a ring can be drawn without the rest of them
+def used_defs(defs, fragment):
+	root = ET.fromstring('<g xmlns="%s" xmlns:xlink="%s">%s</g>' % (SVG_NS, XLINK_NS, defs))
+	strip_namespaces(root)
+	by_id = {}
+	for elem in root:
+		elem.tail = None
+		by_id[elem.get("id")] = ET.tostring(elem, encoding="unicode")
+
+	used = set()
+	todo = [fragment]
+	while todo:
+		for ids in ref_re.findall(todo.pop()):
+			for ref in ids:
+				if ref in by_id and ref not in used:
+					used.add(ref)
+					todo.append(by_id[ref])
+	return "\n".join(svg for (elem_id, svg) in by_id.items() if elem_id in used)
+
+####
+#### Embedded artwork
+####
+
+# editor state that has no effect on how the drawing looks
+editor_ns = [
+	"http://www.inkscape.org/namespaces/inkscape",
+	"http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd",
+	"http://creativecommons.org/ns#",
+	"http://purl.org/dc/elements/1.1/",
+	"http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+]
+
+url_re = re.compile(r"url\(#([^)]+)\)")
+
+def is_editor(name):
+	return any(name.startswith("{" + ns + "}") for ns in editor_ns)
+
+def strip_editor(elem):
+	for child in list(elem):
+		if is_editor(child.tag) or local_name(child.tag) == "metadata":
+			elem.remove(child)
+		else:
+			strip_editor(child)
+	for k in list(elem.attrib):
+		if is_editor(k):
+			del elem.attrib[k]
+	if "style" in elem.attrib:
+		style = [s for s in elem.get("style").split(";") if s.strip() and not s.strip().startswith("-inkscape")]
+		elem.set("style", ";".join(style))
+
+# initial values of the inherited properties that Inkscape writes into
+# every style, dropped where nothing above sets another value
+style_defaults = {
+	"letter-spacing": "0px",
+	"word-spacing": "0px",
+	"stroke-dasharray": "none",
+	"stroke-opacity": "1",
+	"fill-opacity": "1",
+	"stroke-linecap": "butt",
+	"stroke-linejoin": "miter",
+	"font-style": "normal",
+	"font-variant": "normal",
+	"font-weight": "normal",
+	"font-stretch": "normal",
+	"text-anchor": "start",
+}
+
+def clean_styles(elem, inherited={}):
+	inherited = dict(inherited)
+	for name in style_defaults:
+		if name in elem.attrib:
+			inherited[name] = elem.get(name)
+	if "style" in elem.attrib:
+		style = []
+		for prop in elem.get("style").split(";"):
+			(name, _, value) = [x.strip() for x in prop.partition(":")]
+			if name in style_defaults and inherited.get(name, style_defaults[name]) == value:
+				continue
+			inherited[name] = value
+			style.append(name + ":" + value)
+		if style:
+			elem.set("style", ";".join(style))
+		else:
+			del elem.attrib["style"]
+	for child in elem:
+		clean_styles(child, inherited)
+
+# the ids of the artwork have to be unique in the drawing, and the
+# ones that nothing refers to can be dropped
+def prefix_ids(root, prefix):
+	used = set()
+	for e in root.iter():
+		for (k,v) in e.attrib.items():
+			used.update(url_re.findall(v))
+			if local_name(k) == "href" and v.startswith("#"):
+				used.add(v[1:])
+	for e in root.iter():
+		for (k,v) in list(e.attrib.items()):
+			if k == "id":
+				if v in used:
+					e.set(k, prefix + v)
+				else:
+					del e.attrib[k]
+			elif local_name(k) == "href" and v.startswith("#"):
+				e.set(k, "#" + prefix + v[1:])
+			elif "url(#" in v:
+				e.set(k, url_re.sub(lambda m: "url(#" + prefix + m.group(1) + ")", v))
+
+# Turn a complete svg document, like the ones drawn in Inkscape, into a
+# nested <svg> element at x,y with the given size.  This draws the same
+# as an <image> of the document, but without the base64 and the editor
+# metadata.  With digits its transforms are folded and the coordinates
+# rounded like optimize_fragment() does for the rings.
+def inline_svg(svg, x, y, width, height, prefix, digits=None):
+	root = ET.fromstring(svg.encode("utf-8"))
+	strip_editor(root)
+	prefix_ids(root, prefix)
+
+	strip_namespaces(root)
+
+	if digits is not None:
+		clean_styles(root)
+		optimize_elem(root, identity, digits, {})
+
+	if "viewBox" not in root.attrib:
+		root.set("viewBox", "0 0 %s %s" % (root.get("width"), root.get("height")))
+	for name in ("version", "width", "height"):
+		root.attrib.pop(name, None)
+	for (name,value) in (("x", x), ("y", y), ("width", width), ("height", height)):
+		root.set(name, fmt_num(value, 3))
+
+	tidy(root)
+	return ET.tostring(root, encoding="unicode").rstrip("\n")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# Compact elements for the thousands of ticks and labels on the rings.
+#
+# drawsvg makes an object with its own attribute dict for every line and
+# text, even though all of the ticks in a group only differ in their
+# transform.  These elements keep the attributes once per group and the
+# numbers for each transform in a numpy table, and write the elements
+# straight to the output file as the drawing is saved.
+#
+# The output is the same as the drawsvg elements that they replace,
+# except that & < > and " in the attribute values are escaped so that
+# the svg stays valid.
+#
+
+import numpy as np
+import drawsvg as draw
+from xml.sax.saxutils import escape
+
+# one row per element, scalars are repeated for every row
+def table(columns):
+	columns = np.broadcast_arrays(*[np.asarray(c, dtype=float) for c in columns])
+	return np.column_stack(columns) if columns[0].ndim else np.zeros((0, len(columns)))
+
+def normalize(args):
+	return {draw.types.normalize_attribute_name(k): v for (k,v) in args.items()}
+
+def write_tag(output_file, tag, args, transform, content=None):
+	output_file.write("<" + tag)
+	for (k,v) in args.items():
+		if k == "transform":
+			v = transform
+		if v is None:
+			continue
+		output_file.write(' %s="%s"' % (k, escape(str(v), {'"': "&quot;"})))
+	if content is None:
+		output_file.write(" />")
+	else:
+		output_file.write(">" + content + "</" + tag + ">")
+
+# Base class for a run of sibling elements with the same tag and
+# attributes, except for the transform argument which is a format
+# string that is filled in with the row of the table for each one.
+class Elements(draw.DrawingElement):
+	TAG_NAME = "_"
+
+	def __init__(self, columns, **args):
+		self.rows = table(columns)
+		self.args = normalize(args)
+
+	def __len__(self):
+		return len(self.rows)
+
+	def write_one(self, output_file, i, transform, lcontext, id_map, is_duplicate):
+		write_tag(output_file, self.TAG_NAME, self.args, transform)
+
+	def write_svg_element(self, id_map, is_duplicate, output_file, lcontext, dry_run, force_dup=False):
+		# nothing in here ever needs an id
+		if dry_run:
+			return
+		template = self.args.get("transform")
+		for (i,row) in enumerate(self.rows):
+			if i != 0:
+				output_file.write("\n")
+			self.write_one(output_file, i, template % tuple(row), lcontext, id_map, is_duplicate)
+
+# Radial lines from x0 to x1, the same as draw.Line(x0, 0, x1, 0, **args)
+class Ticks(Elements):
+	TAG_NAME = "path"
+
+	def __init__(self, x0, x1, columns, **args):
+		super().__init__(columns, d="M%s,0 L%s,0" % (x0, x1), **args)
+
+# Labels, the same as draw.Text(text, size, x, y, **args) for each text
+class Texts(Elements):
+	TAG_NAME = "text"
+
+	def __init__(self, texts, size, x, y, columns, **args):
+		super().__init__(columns, x=x, y=y, font_size=size, **args)
+		self.texts = list(texts)
+
+	def write_one(self, output_file, i, transform, lcontext, id_map, is_duplicate):
+		text = self.texts[i]
+		if "\n" not in text:
+			write_tag(output_file, self.TAG_NAME, self.args, transform, escape(text))
+			return
+
+		# multi-line labels are rare, let drawsvg do the tspans
+		args = dict(self.args, transform=transform)
+		(x, y, size) = (args.pop("x"), args.pop("y"), args.pop("font-size"))
+		draw.Text(text, size, x, y, **args).write_svg_element(
+			id_map, is_duplicate, output_file, lcontext, False)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# Rebuild the rule whenever its source, artwork or parameters change.
+#
+# make-rule.py and the modules next to it are loaded again for every
+# build, but the ring cache stays in memory, so only the rings whose code
+# or constants changed are built again and the rest are reused from the
+# build before.  The key of a ring has the source of the helper modules
+# that it uses, so an edit to curves.py rebuilds the rings with curves
+# and the memory doesn't need to be cleared.  The files are polled,
+# which needs nothing extra and is quick enough for the few files that
+# there are.
+#
+# With a preview port, the output is shown on a page that reloads itself
+# with server-sent events after each build.
+#
+
+import os
+import sys
+import time
+import asyncio
+import linecache
+import importlib
+import importlib.util
+import traceback
+import ringcache
+import server
+
+here = os.path.dirname(os.path.abspath(__file__))
+artwork = ["latitude.svg", "longitude.svg"]
+interval = 0.5 # seconds between polls
+
+def load_rule(path):
+	spec = importlib.util.spec_from_file_location("make_rule", path)
+	rule = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(rule)
+	return rule
+
+# the modules of this repository that are loaded, except this one
+def local_modules():
+	modules = []
+	for module in list(sys.modules.values()):
+		fname = getattr(module, "__file__", None)
+		if fname and os.path.dirname(os.path.abspath(fname)) == here and module.__name__ not in ("__main__", __name__):
+			modules.append(module)
+	return modules
+
+def watched_files(rule_path, extra):
+	files = [rule_path] + [m.__file__ for m in local_modules()]
+	files += [os.path.join(here, name) for name in artwork] + list(extra)
+	return sorted(set(os.path.abspath(f) for f in files))
+
+def mtimes(files):
+	times = {}
+	for fname in files:
+		try:
+			times[fname] = os.stat(fname).st_mtime_ns
+		except OSError:
+			times[fname] = None
+	return times
+
+# Build with the current source, returns False if it failed.  Errors are
+# printed and the next change tries again.
+def build(rule_path, argv, changed, log):
+	start = time.perf_counter()
+	linecache.checkcache()
+	before = set(ringcache.memory)
+	try:
+		for module in local_modules():
+			# the ring cache keeps its memory unless it is what changed
+			if module is not ringcache or os.path.abspath(module.__file__) in changed:
+				importlib.reload(module)
+		# the old functions are never used again
+		ringcache.sources.clear()
+		load_rule(rule_path).main(argv)
+	except Exception:
+		traceback.print_exc(file=log)
+		return False
+	except SystemExit:
+		# argparse errors
+		return False
+	new = len(set(ringcache.memory) - before)
+	print("built in %.2f s, %d rings changed" % (time.perf_counter() - start, new), file=log)
+	return True
+
+def changes(old, new):
+	return [fname for fname in new if new[fname] != old.get(fname)]
+
+# Build now and after each change, calling done() after each good build
+async def rebuild(rule_path, argv, extra, log, done=None):
+	loop = asyncio.get_running_loop()
+	times = {}
+	while True:
+		# the modules that are used can change after a build
+		new = mtimes(watched_files(rule_path, extra))
+		changed = changes(times, new)
+		if changed:
+			if times:
+				print("changed: " + " ".join(os.path.relpath(f, here) for f in changed), file=log)
+			else:
+				changed = []
+			times = new
+			# in a thread so that the preview page can still be loaded
+			if await loop.run_in_executor(None, build, rule_path, argv, changed, log) and done:
+				done()
+		await asyncio.sleep(interval)
+
+# Run make-rule.py with argv after each change to one of its files or
+# the extra ones, and if there is a preview port show the output on it
+def watch(rule_path, argv, output_file, extra=(), preview=None, log=sys.stderr):
+	print("watching %d files" % (len(watched_files(rule_path, extra))), file=log)
+	if preview is None:
+		try:
+			asyncio.run(rebuild(rule_path, argv, extra, log))
+		except KeyboardInterrupt:
+			pass
+		return
+
+	print("preview on http://127.0.0.1:%d/" % (preview), file=log)
+	listeners = set()
+	def reload():
+		for queue in listeners:
+			queue.put_nowait(str(time.time()))
+	routes = preview_routes(output_file, listeners)
+	server.serve(routes, port=preview, log=None, tasks=[lambda: rebuild(rule_path, argv, extra, log, reload)])
+
+####
+#### Preview page
+####
+
+preview_page = b"""<!doctype html>
+<meta charset=utf-8>
+<title>make-rule.py preview</title>
+<body style="margin: 0">
+<img id="output" src="/output" style="width: 100%">
+<script>
+new EventSource("/events").onmessage = (event) => {
+	document.getElementById("output").src = "/output?" + event.data;
+};
+</script>
+"""
+
+content_types = {".svg": "image/svg+xml", ".png": "image/png"}
+
+# the page, the output and the events that tell the page to reload,
+# with a queue in listeners for each page that is open
+def preview_routes(output_file, listeners):
+	async def page(query):
+		return ("text/html", preview_page)
+
+	async def output(query):
+		with open(output_file, "rb") as f:
+			data = f.read()
+		return (content_types.get(os.path.splitext(output_file)[1].lower(), "application/octet-stream"), data)
+
+	async def event_stream():
+		queue = asyncio.Queue()
+		listeners.add(queue)
+		try:
+			while True:
+				yield ("data: %s\n\n" % (await queue.get())).encode("utf-8")
+		finally:
+			listeners.discard(queue)
+
+	async def events(query):
+		return ("text/event-stream", event_stream())
+
+	return {"/": page, "/output": output, "/events": events}